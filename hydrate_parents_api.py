@@ -8,24 +8,56 @@ Now recursively fetches both parent tweets AND any tweets quoted by those parent
 Usage:
     export TWITTERAPI_KEY="pk_live_yourKeyHere"
     python hydrate_parents_api.py
+    
+    # Skip the GUI folder picker (headless / scripted runs)
+    python hydrate_parents_api.py --folder /path/to/twitter/data
+    
+    # Override the number of IDs sent per request
+    python hydrate_parents_api.py --batch-size 50
+    
+    # Keep more hydration requests in flight at once
+    python hydrate_parents_api.py --workers 32
+    
+    # Also write the full cache out as a single parents.json
+    python hydrate_parents_api.py --export-json
+    
+    # Also write a column-oriented parents_columnar.json
+    python hydrate_parents_api.py --columnar
+    
+    # Re-request IDs that recent runs logged to not_found.jsonl
+    python hydrate_parents_api.py --retry-not-found
 
 Requirements:
     - TWITTERAPI_KEY environment variable
     - requests library
+    - brotli library (optional, lets the API send brotli-compressed responses)
+    - orjson library (optional, speeds up JSON parsing and parents.json writes)
+    - ijson library (optional, streams a legacy parents.json during migration)
+    - tqdm library (optional, shows hydration progress as a single progress bar)
     - Input JSONL files in current directory (tweets_*.jsonl, likes_*.jsonl, bookmarks_*.jsonl)
-    - Writes to parents.json (includes both parents and quoted tweets)
+    - Appends to parents.jsonl (includes both parents and quoted tweets)
+    - Appends IDs the API couldn't return to not_found.jsonl (skipped for NOT_FOUND_RETRY_DAYS)
 """
 
 import os
 import sys
 import json
+import re
+import random
+import email.utils
+import mmap
 import time
 import itertools
+import argparse
+import threading
+import concurrent.futures
+from types import MappingProxyType
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
 import pathlib
-import tkinter as tk
-from tkinter import filedialog
-from typing import Set, List, Dict, Any, Iterator
+from typing import Set, List, Dict, Any, BinaryIO, Iterable, Iterator, Sequence, Tuple
 # Load environment variables from .env file if available
 try:
     from dotenv import load_dotenv
@@ -33,6 +65,34 @@ try:
 except ImportError:
     # python-dotenv is not installed; continue without loading .env
     pass
+# Prefer orjson for JSONL parsing; it accepts bytes directly and is several times faster.
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so existing handlers still apply.
+try:
+    import orjson
+    json_loads = orjson.loads
+    
+    def json_dumps_line(obj: Any) -> bytes:
+        """Serialize obj as one compact UTF-8 JSONL line, newline included."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+    
+    def json_dumps_line(obj: Any) -> bytes:
+        """Serialize obj as one compact UTF-8 JSONL line, newline included."""
+        return (json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+# tqdm is optional; with it, per-batch progress lines collapse into one progress bar
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+# ijson is only needed to stream legacy parents.json files; fall back to a full parse without it
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 # Configuration
 API_KEY = os.getenv("TWITTERAPI_KEY")
@@ -52,9 +112,58 @@ BATCH_SIZE = 100                               # IDs per request (safe ceiling)
 BASE_URL = "https://api.twitterapi.io/twitter/tweets"
 HEADERS = {"x-api-key": API_KEY}
 CREDITS_PER_TWEET = 15                         # Cost per tweet
-RATE_LIMIT_DELAY = 0.05                        # ~20 QPS to stay well under 200 QPS limit
+RATE_LIMIT_QPS = 200                           # Token bucket refill rate (TwitterAPI.io's QPS limit)
+RATE_LIMIT_DEFAULT_WAIT = 5                    # Cooldown in seconds when a 429 carries no Retry-After
+RATE_LIMIT_LOW_WATER = 20                      # Slow the bucket below this x-ratelimit-remaining (or 10% of x-ratelimit-limit)
 MAX_RETRIES = 3                                # Maximum retry attempts for rate limits
-RETRY_BACKOFF = [60, 120, 300]                 # Backoff delays in seconds (1min, 2min, 5min)
+RETRY_BACKOFF_BASE = 30                        # Base network-error backoff in seconds, doubled per attempt with jitter
+RETRY_BACKOFF_MAX = 300                        # Backoff ceiling in seconds
+MAX_WORKERS = 8                                # Concurrent batch requests in flight (AIMD ceiling)
+RATE_LIMIT_BURST = MAX_WORKERS                 # Tokens the bucket can hold (one per worker)
+READ_BUFFER_SIZE = 1 << 20                     # 1 MiB read buffer for streaming large JSONL files
+SCAN_CACHE_NAME = ".hydrate_cache.json"        # Per-folder cache of cleaning/scan results for unchanged files
+SCAN_CACHE_VERSION = 2                         # Bump when clean_tweet or scan_jsonl output changes
+NOT_FOUND_CACHE_NAME = "not_found.jsonl"       # Per-folder log of IDs the API answered without returning
+NOT_FOUND_RETRY_DAYS = 30                      # Re-request logged not-found IDs after this many days
+
+# Shared token bucket state for worker threads
+_rate_lock = threading.Lock()
+_tokens = float(RATE_LIMIT_BURST)
+_tokens_updated_at = 0.0
+_refill_rate = float(RATE_LIMIT_QPS)           # Lowered while the server reports little quota left
+_paused_until = 0.0                            # Shared cooldown after a 429, honoured by every worker
+
+# Shared AIMD concurrency state: grows by 0.5 per clean response, halves on 429/5xx
+_concurrency_cond = threading.Condition()
+_concurrency_limit = float(MAX_WORKERS)
+_concurrency_max = MAX_WORKERS
+_in_flight = 0
+
+def create_session(max_workers: int = MAX_WORKERS) -> requests.Session:
+    """Create a keep-alive session with a connection pool shared by all hydration workers."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    # Ask for compressed tweet JSON; urllib3 advertises br/zstd only when brotli/zstandard
+    # are installed, so this never requests an encoding it can't decode
+    session.headers["Accept-Encoding"] = make_headers(accept_encoding=True)["accept-encoding"]
+    # Transient server errors are retried by urllib3; 429s are handled in fetch_batch
+    retry = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    # Every request goes to one host, so one pool with a connection per worker is enough
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
+
+SESSION = create_session()
+
+# Shared read-only stand-in for missing sub-objects, so lookup chains don't allocate {}
+_EMPTY = MappingProxyType({})
 
 def clean_tweet(raw_tweet):
     """
@@ -64,10 +173,11 @@ def clean_tweet(raw_tweet):
     if not raw_tweet or not isinstance(raw_tweet, dict):
         return None  # Skip invalid tweets
     
-    # Use .get() to safely access nested keys that might not exist
-    legacy = raw_tweet.get('raw', {}).get('legacy', {})
-    core_user_results = raw_tweet.get('raw', {}).get('core', {}).get('user_results', {}).get('result', {})
-    core_user = core_user_results.get('core', {})
+    # Walk each nested path once; `or _EMPTY` covers both missing keys and nulls
+    raw = raw_tweet.get('raw') or _EMPTY
+    legacy = raw.get('legacy') or _EMPTY
+    core_user_results = ((raw.get('core') or _EMPTY).get('user_results') or _EMPTY).get('result') or _EMPTY
+    core_user = core_user_results.get('core') or _EMPTY
     
     # 1. Extract Basic Information
     cleaned_data = {
@@ -79,7 +189,7 @@ def clean_tweet(raw_tweet):
     }
 
     # 2. Extract Full Text (handles long tweets/notes)
-    note_text = raw_tweet.get('raw', {}).get('note_tweet', {}).get('note_tweet_results', {}).get('result', {}).get('text')
+    note_text = (((raw.get('note_tweet') or _EMPTY).get('note_tweet_results') or _EMPTY).get('result') or _EMPTY).get('text')
     cleaned_data['text'] = note_text or legacy.get('full_text') or raw_tweet.get('text', '')
 
     # 3. Determine Interaction Type and Linked Data
@@ -90,46 +200,33 @@ def clean_tweet(raw_tweet):
     cleaned_data['retweeted_text'] = None
     cleaned_data['retweeted_screen_name'] = None
 
-    if legacy.get('in_reply_to_status_id_str'):
+    if reply_to_id := legacy.get('in_reply_to_status_id_str'):
         cleaned_data['interaction_type'] = 'reply'
-        cleaned_data['linked_tweet_id'] = legacy.get('in_reply_to_status_id_str')
+        cleaned_data['linked_tweet_id'] = reply_to_id
         cleaned_data['reply_to_screen_name'] = legacy.get('in_reply_to_screen_name')
-    elif legacy.get('quoted_status_id_str'):
+    elif quoted_id := legacy.get('quoted_status_id_str'):
         cleaned_data['interaction_type'] = 'quote_tweet'
-        cleaned_data['linked_tweet_id'] = legacy.get('quoted_status_id_str')
-    elif legacy.get('retweeted_status_result'):
+        cleaned_data['linked_tweet_id'] = quoted_id
+    elif retweeted_status_result := legacy.get('retweeted_status_result'):
         cleaned_data['interaction_type'] = 'retweet'
-        retweeted_result = legacy.get('retweeted_status_result', {}).get('result', {})
+        retweeted_result = retweeted_status_result.get('result') or _EMPTY
         
         # The ID of the original tweet that was retweeted
         cleaned_data['linked_tweet_id'] = retweeted_result.get('rest_id')
         
         # Extract original tweet's text and author
-        rt_legacy = retweeted_result.get('legacy', {})
-        rt_note = retweeted_result.get('note_tweet', {}).get('note_tweet_results', {}).get('result', {})
+        rt_legacy = retweeted_result.get('legacy') or _EMPTY
+        rt_note = ((retweeted_result.get('note_tweet') or _EMPTY).get('note_tweet_results') or _EMPTY).get('result') or _EMPTY
         cleaned_data['retweeted_text'] = rt_note.get('text') or rt_legacy.get('full_text')
         
-        # Extract retweeted user's screen name with multiple fallback paths
-        retweeted_screen_name = None
-        
-        # Method 1: Core user results legacy path
-        rt_user = retweeted_result.get('core', {}).get('user_results', {}).get('result', {}).get('legacy', {})
-        if rt_user:
-            retweeted_screen_name = rt_user.get('screen_name')
-        
-        # Method 2: Core user results core path (alternative structure)
-        if not retweeted_screen_name:
-            rt_user_core = retweeted_result.get('core', {}).get('user_results', {}).get('result', {}).get('core', {})
-            if rt_user_core:
-                retweeted_screen_name = rt_user_core.get('screen_name')
-        
-        # Method 3: Direct user object in retweeted result
-        if not retweeted_screen_name:
-            rt_user_direct = retweeted_result.get('user', {})
-            if rt_user_direct:
-                retweeted_screen_name = rt_user_direct.get('screen_name')
-        
-        cleaned_data['retweeted_screen_name'] = retweeted_screen_name
+        # Extract retweeted user's screen name, trying the user result's legacy and core
+        # paths, then a direct user object in the retweeted result
+        rt_user_result = ((retweeted_result.get('core') or _EMPTY).get('user_results') or _EMPTY).get('result') or _EMPTY
+        cleaned_data['retweeted_screen_name'] = (
+            (rt_user_result.get('legacy') or _EMPTY).get('screen_name')
+            or (rt_user_result.get('core') or _EMPTY).get('screen_name')
+            or (retweeted_result.get('user') or _EMPTY).get('screen_name')
+        )
 
     if legacy.get('bookmarked'):
          if cleaned_data['interaction_type'] == 'tweet':
@@ -137,32 +234,50 @@ def clean_tweet(raw_tweet):
 
     # 4. Extract URLs
     urls = []
-    for url_entity in legacy.get('entities', {}).get('urls', []):
+    for url_entity in (legacy.get('entities') or _EMPTY).get('urls') or ():
         if 'expanded_url' in url_entity:
             urls.append(url_entity['expanded_url'])
             
-    card = raw_tweet.get('raw', {}).get('card', {})
+    card = raw.get('card')
     if card:
-        for item in card.get('legacy', {}).get('binding_values', []):
+        for item in (card.get('legacy') or _EMPTY).get('binding_values') or ():
             if item.get('key') == 'card_url':
-                urls.append(item.get('value', {}).get('string_value'))
+                urls.append((item.get('value') or _EMPTY).get('string_value'))
 
-    cleaned_data['urls'] = list(set(urls))
+    # Dedupe in first-seen order, dropping card_url entries that had no string_value
+    cleaned_data['urls'] = list(dict.fromkeys(u for u in urls if u))
 
     # 5. Extract Media URLs
-    media_urls = []
-    extended_entities = legacy.get('extended_entities', {})
+    extended_entities = legacy.get('extended_entities')
     if extended_entities and 'media' in extended_entities:
-        for media_item in extended_entities['media']:
-            media_urls.append(media_item.get('media_url_https'))
-            
-    cleaned_data['media_urls'] = media_urls
+        cleaned_data['media_urls'] = [media_item.get('media_url_https') for media_item in extended_entities['media']]
+    else:
+        cleaned_data['media_urls'] = []
 
     return cleaned_data
 
-def get_folder_path() -> pathlib.Path:
-    """Get folder path via GUI folder picker."""
+def get_folder_path(folder_arg: str = None) -> pathlib.Path:
+    """
+    Get folder path from the --folder argument, or via GUI folder picker.
+    
+    tkinter is imported only when the picker is actually needed, so --folder runs
+    (and worker processes importing this module) skip loading Tk.
+    
+    Args:
+        folder_arg: Folder given on the command line, if any
+    """
+    if folder_arg:
+        folder = pathlib.Path(folder_arg)
+        if not folder.is_dir():
+            print(f"❌ Invalid folder path: {folder}")
+            sys.exit(1)
+        print(f"📁 Using folder from CLI: {folder}")
+        return folder
+    
     try:
+        import tkinter as tk
+        from tkinter import filedialog
+        
         root = tk.Tk()
         root.withdraw()  # Hide the main window
         
@@ -183,12 +298,100 @@ def get_folder_path() -> pathlib.Path:
         print("💡 Falling back to current directory")
         return pathlib.Path(".")
 
-def find_and_clean_files(folder: pathlib.Path) -> List[pathlib.Path]:
+def file_signature(file_path: pathlib.Path) -> List[int]:
+    """Return [st_mtime_ns, st_size], which changes whenever the file is rewritten."""
+    stat = file_path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+def load_scan_cache(folder: pathlib.Path) -> Dict[str, Any]:
+    """
+    Load the folder's cleaning/scan cache, starting fresh if it is missing, unreadable or outdated.
+    
+    Args:
+        folder: Folder containing the input files
+        
+    Returns:
+        Cache dict with "clean" (input name -> signatures) and "scan" (cleaned name -> IDs) entries
+    """
+    cache_path = folder / SCAN_CACHE_NAME
+    try:
+        cache = json_loads(cache_path.read_bytes())
+        if cache.get("version") == SCAN_CACHE_VERSION:
+            return cache
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable {SCAN_CACHE_NAME}: {e}")
+    return {"version": SCAN_CACHE_VERSION, "clean": {}, "scan": {}}
+
+def save_scan_cache(folder: pathlib.Path, cache: Dict[str, Any]) -> None:
+    """
+    Write the cleaning/scan cache atomically.
+    
+    Args:
+        folder: Folder containing the input files
+        cache: Cache dict from load_scan_cache
+    """
+    cache_path = folder / SCAN_CACHE_NAME
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        tmp_path.write_bytes(json_dumps_line(cache))
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"⚠️  Failed to save {SCAN_CACHE_NAME}: {e}")
+
+def clean_jsonl_file(input_file: pathlib.Path, cleaned_file: pathlib.Path) -> Tuple[int, int]:
+    """
+    Clean one raw JSONL export into its cleaned_*.jsonl counterpart.
+    
+    Args:
+        input_file: Raw JSONL file
+        cleaned_file: Destination for the cleaned lines
+        
+    Returns:
+        Tuple of (tweets written, lines skipped)
+    """
+    print(f"🧹 Cleaning {input_file.name} -> {cleaned_file.name}")
+    cleaned_count = 0
+    error_count = 0
+    
+    # Read raw bytes: json_loads takes them directly, so lines skip a separate UTF-8 decode pass.
+    # The output side gets the same large buffer so per-tweet writes coalesce into few syscalls.
+    with input_file.open('rb', buffering=READ_BUFFER_SIZE) as infile, \
+         cleaned_file.open('wb', buffering=READ_BUFFER_SIZE) as outfile:
+        for line_no, line in enumerate(infile, 1):
+            line = line.strip()
+            if not line:
+                continue
+                
+            try:
+                raw_tweet_data = json_loads(line)
+                cleaned_tweet = clean_tweet(raw_tweet_data)
+                if cleaned_tweet is not None:
+                    outfile.write(json_dumps_line(cleaned_tweet))
+                    cleaned_count += 1
+                else:
+                    print(f"⚠️ Skipping invalid tweet data on line {line_no} in {input_file.name}")
+                    error_count += 1
+            except json.JSONDecodeError:
+                print(f"⚠️ Skipping invalid JSON line {line_no} in {input_file.name}")
+                error_count += 1
+                continue
+            except Exception as e:
+                print(f"⚠️ Error processing line {line_no} in {input_file.name}: {e}")
+                error_count += 1
+                continue
+    
+    return cleaned_count, error_count
+
+def find_and_clean_files(folder: pathlib.Path, cache: Dict[str, Any] | None = None) -> List[pathlib.Path]:
     """
     Find input JSONL files in the folder and create cleaned versions.
     
     Args:
         folder: Path to folder containing input files
+        cache: Scan cache from load_scan_cache; inputs whose cleaned file is still
+            current are not cleaned again, and fresh results are recorded in it
         
     Returns:
         List of paths to cleaned files
@@ -223,116 +426,330 @@ def find_and_clean_files(folder: pathlib.Path) -> List[pathlib.Path]:
     
     print(f"📁 Found {len(input_files)} input files to clean")
     
-    # Clean each file
+    # Work out which files need cleaning
+    to_clean = []
     for input_file in input_files:
         # Generate cleaned filename (e.g., tweets_2025-01-01.jsonl -> cleaned_tweets_2025-01-01.jsonl)
         stem = input_file.stem  # e.g., "tweets_2025-01-01"
         cleaned_stem = f"cleaned_{stem}"
         cleaned_file = input_file.parent / f"{cleaned_stem}.jsonl"
         
-        print(f"🧹 Cleaning {input_file.name} -> {cleaned_file.name}")
-        
-        try:
-            with input_file.open('r', encoding='utf-8') as infile, cleaned_file.open('w', encoding='utf-8') as outfile:
-                cleaned_count = 0
-                error_count = 0
-                
-                for line_no, line in enumerate(infile, 1):
-                    line = line.strip()
-                    if not line:
-                        continue
-                        
-                    try:
-                        raw_tweet_data = json.loads(line)
-                        cleaned_tweet = clean_tweet(raw_tweet_data)
-                        if cleaned_tweet is not None:
-                            outfile.write(json.dumps(cleaned_tweet) + '\n')
-                            cleaned_count += 1
-                        else:
-                            print(f"⚠️ Skipping invalid tweet data on line {line_no} in {input_file.name}")
-                            error_count += 1
-                    except json.JSONDecodeError:
-                        print(f"⚠️ Skipping invalid JSON line {line_no} in {input_file.name}")
-                        error_count += 1
-                        continue
-                    except Exception as e:
-                        print(f"⚠️ Error processing line {line_no} in {input_file.name}: {e}")
-                        error_count += 1
-                        continue
-                
-                print(f"✅ Cleaned {cleaned_count} tweets to {cleaned_file.name}")
-                if error_count > 0:
-                    print(f"⚠️ {error_count} errors encountered during cleaning")
-                
+        # Re-cleaning rewrites the file and would invalidate its scan cache entry, so
+        # leave it alone when neither the input nor the cleaned output has changed
+        source_signature = file_signature(input_file)
+        if cache is not None and cleaned_file.exists():
+            entry = cache["clean"].get(input_file.name)
+            if entry and entry["source"] == source_signature and entry["cleaned"] == file_signature(cleaned_file):
+                print(f"⏭️  {cleaned_file.name} is up to date")
                 cleaned_files.append(cleaned_file)
-                
-        except Exception as e:
-            print(f"❌ Failed to clean {input_file.name}: {e}")
-            continue
+                continue
+        
+        to_clean.append((input_file, cleaned_file, source_signature))
+    
+    if not to_clean:
+        return cleaned_files
+    
+    # Cleaning is CPU-bound and files are independent, so clean them in parallel worker
+    # processes, largest first; a single file is cleaned inline
+    to_clean.sort(key=lambda item: item[2][1], reverse=True)
+    max_workers = min(len(to_clean), os.cpu_count() or 1)
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    try:
+        if executor is not None:
+            results = [executor.submit(clean_jsonl_file, input_file, cleaned_file)
+                       for input_file, cleaned_file, _ in to_clean]
+        
+        for index, (input_file, cleaned_file, source_signature) in enumerate(to_clean):
+            try:
+                if executor is not None:
+                    cleaned_count, error_count = results[index].result()
+                else:
+                    cleaned_count, error_count = clean_jsonl_file(input_file, cleaned_file)
+            except Exception as e:
+                print(f"❌ Failed to clean {input_file.name}: {e}")
+                continue
+            
+            print(f"✅ Cleaned {cleaned_count} tweets to {cleaned_file.name}")
+            if error_count > 0:
+                print(f"⚠️ {error_count} errors encountered during cleaning")
+            
+            cleaned_files.append(cleaned_file)
+            
+            if cache is not None:
+                cache["clean"][input_file.name] = {
+                    "source": source_signature,
+                    "cleaned": file_signature(cleaned_file),
+                }
+    finally:
+        if executor is not None:
+            executor.shutdown()
     
     return cleaned_files
 
-def chunks(lst: List[str], n: int) -> Iterator[List[str]]:
-    """Yield successive n-sized chunks from lst."""
-    it = iter(lst)
+def extract_quoted_tweet_ids(tweet: Dict[str, Any], quoted_ids: Set[str]) -> None:
+    """
+    Add the IDs of tweets quoted by one tweet to quoted_ids.
+    
+    Takes a single tweet so callers can collect quotes as tweets stream in,
+    without keeping a list of each depth's tweets around.
+    
+    Args:
+        tweet: Tweet object
+        quoted_ids: Set to add quoted tweet IDs to
+    """
+    add = quoted_ids.add
+    get = tweet.get
+    
+    # Check referenced_tweets for quoted tweets (Twitter API v2 format)
+    referenced = get("referenced_tweets")
+    if referenced:
+        for ref in referenced:
+            ref_id = ref.get("id")
+            if ref_id and ref.get("type") == "quoted":
+                add(str(ref_id))
+    
+    # Also check legacy format (if present)
+    legacy = get("legacy")
+    if legacy and (quoted_id := legacy.get("quoted_status_id_str")):
+        add(str(quoted_id))
+    
+    # Check GraphQL quoted_status_result structure
+    quoted_status_result = get("quoted_status_result")
+    if quoted_status_result and (quoted_result := quoted_status_result.get("result")):
+        # Extract rest_id from the quoted tweet result
+        if quoted_rest_id := quoted_result.get("rest_id"):
+            add(str(quoted_rest_id))
+    
+    # Check for quotedRefResult (another GraphQL format)
+    quoted_ref_result = get("quotedRefResult")
+    if quoted_ref_result and (result := quoted_ref_result.get("result")):
+        if result.get("__typename") == "Tweet" and (quoted_id := result.get("rest_id")):
+            add(str(quoted_id))
+
+def wait_for_rate_limit() -> None:
+    """
+    Take a token from the shared bucket, blocking until one is available,
+    and hold every worker back while a rate-limit cooldown is active.
+    """
+    global _tokens, _tokens_updated_at
     while True:
-        batch = list(itertools.islice(it, n))
-        if not batch:
-            break
-        yield batch
+        with _rate_lock:
+            now = time.monotonic()
+            if now < _paused_until:
+                delay = _paused_until - now
+            else:
+                # Refill for the time that passed since the last request, capped at the burst size
+                elapsed = now - max(_tokens_updated_at, _paused_until)
+                _tokens = min(float(RATE_LIMIT_BURST), _tokens + elapsed * _refill_rate)
+                _tokens_updated_at = now
+                if _tokens >= 1:
+                    _tokens -= 1
+                    return
+                delay = (1 - _tokens) / _refill_rate
+        time.sleep(delay)
+
+def pause_requests(seconds: float) -> None:
+    """Start (or extend) a cooldown that blocks all workers for the given number of seconds."""
+    global _paused_until, _tokens
+    with _rate_lock:
+        _paused_until = max(_paused_until, time.monotonic() + seconds)
+        # Resume gently after the cooldown instead of releasing a full burst at once
+        _tokens = 0.0
 
-def extract_quoted_tweet_ids(tweets: List[Dict[str, Any]]) -> Set[str]:
+def retry_after_seconds(response: requests.Response) -> float:
     """
-    Extract quoted tweet IDs from a list of tweets.
+    Return how long to wait after a 429, from the Retry-After header if present.
     
     Args:
-        tweets: List of tweet objects
+        response: The rate-limited response
         
     Returns:
-        Set of quoted tweet IDs
+        Seconds to wait before the next request
     """
-    quoted_ids = set()
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            # HTTP-date form
+            try:
+                retry_at = email.utils.parsedate_to_datetime(retry_after)
+                return max(retry_at.timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    return float(RATE_LIMIT_DEFAULT_WAIT)
+
+def update_rate_from_headers(response: requests.Response) -> None:
+    """
+    Adjust the token bucket from x-ratelimit-remaining / x-ratelimit-reset, if the server sends them.
     
-    for tweet in tweets:
-        # Check referenced_tweets for quoted tweets (Twitter API v2 format)
-        referenced = tweet.get("referenced_tweets", [])
-        for ref in referenced:
-            if ref.get("type") == "quoted" and ref.get("id"):
-                quoted_ids.add(str(ref["id"]))
-        
-        # Also check legacy format (if present)
-        legacy = tweet.get("legacy", {})
-        quoted_id = legacy.get("quoted_status_id_str")
-        if quoted_id:
-            quoted_ids.add(str(quoted_id))
-        
-        # Check GraphQL quoted_status_result structure
-        quoted_status_result = tweet.get("quoted_status_result", {})
-        if quoted_status_result:
-            quoted_result = quoted_status_result.get("result", {})
-            if quoted_result:
-                # Extract rest_id from the quoted tweet result
-                quoted_rest_id = quoted_result.get("rest_id")
-                if quoted_rest_id:
-                    quoted_ids.add(str(quoted_rest_id))
-        
-        # Check for quotedRefResult (another GraphQL format)
-        quoted_ref_result = tweet.get("quotedRefResult", {})
-        if quoted_ref_result:
-            result = quoted_ref_result.get("result", {})
-            if result and result.get("__typename") == "Tweet":
-                quoted_id = result.get("rest_id")
-                if quoted_id:
-                    quoted_ids.add(str(quoted_id))
-    
-    return quoted_ids
-
-def hydrate_tweets(tweet_ids: List[str]) -> Iterator[Dict[str, Any]]:
+    Below the low-water mark (10% of x-ratelimit-limit, or RATE_LIMIT_LOW_WATER without it)
+    the refill rate is spread so the remaining quota lasts until the reset; with the quota
+    exhausted every worker waits for the reset.
+    
+    Args:
+        response: Any API response
+    """
+    global _refill_rate
+    remaining = response.headers.get("x-ratelimit-remaining")
+    if remaining is None:
+        return
+    try:
+        remaining = int(remaining)
+    except ValueError:
+        return
+    
+    low_water = RATE_LIMIT_LOW_WATER
+    try:
+        low_water = max(1, int(response.headers.get("x-ratelimit-limit", "")) // 10)
+    except ValueError:
+        pass
+    
+    if remaining >= low_water:
+        with _rate_lock:
+            _refill_rate = float(RATE_LIMIT_QPS)
+        return
+    
+    # Reset is an epoch timestamp on Twitter-style APIs, but accept a delta in seconds too
+    reset_in = None
+    try:
+        reset = float(response.headers.get("x-ratelimit-reset", ""))
+        reset_in = reset - time.time() if reset > 1e9 else reset
+    except ValueError:
+        pass
+    
+    if remaining <= 0:
+        pause_requests(reset_in if reset_in and reset_in > 0 else RATE_LIMIT_DEFAULT_WAIT)
+        return
+    with _rate_lock:
+        if reset_in and reset_in > 0:
+            _refill_rate = min(float(RATE_LIMIT_QPS), max(remaining / reset_in, 0.1))
+        else:
+            _refill_rate = float(RATE_LIMIT_QPS) * remaining / low_water
+
+def reset_concurrency(max_workers: int) -> None:
+    """Set the AIMD ceiling and start the in-flight limit there."""
+    global _concurrency_limit, _concurrency_max
+    with _concurrency_cond:
+        _concurrency_max = max_workers
+        _concurrency_limit = float(max_workers)
+        _concurrency_cond.notify_all()
+
+def acquire_request_slot() -> None:
+    """Block until fewer requests are in flight than the current AIMD limit allows."""
+    global _in_flight
+    with _concurrency_cond:
+        while _in_flight >= max(1, int(_concurrency_limit)):
+            _concurrency_cond.wait()
+        _in_flight += 1
+
+def release_request_slot(congested: bool) -> None:
+    """
+    Release an in-flight slot and adjust the limit: halve it when the server pushed
+    back (429/5xx/connection failure), otherwise grow it additively toward the ceiling.
+    
+    Args:
+        congested: Whether the request was throttled or failed server-side
+    """
+    global _in_flight, _concurrency_limit
+    with _concurrency_cond:
+        _in_flight -= 1
+        if congested:
+            _concurrency_limit = max(1.0, _concurrency_limit * 0.5)
+        else:
+            _concurrency_limit = min(float(_concurrency_max), _concurrency_limit + 0.5)
+        _concurrency_cond.notify_all()
+
+def retry_backoff(attempt: int) -> float:
+    """Exponential backoff with jitter for network errors, so workers don't retry in lockstep."""
+    delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt)
+    return delay * (0.5 + random.random() / 2)
+
+def fetch_batch(batch: Sequence[str], batch_no: int, total_batches: int, quiet: bool = False) -> List[Dict[str, Any]] | None:
+    """
+    Fetch a single batch of tweets from TwitterAPI.io, retrying on rate limits and errors.
+    
+    Args:
+        batch: Tweet ID strings to request together
+        batch_no: 1-based position of this batch (for progress output)
+        total_batches: Total number of batches in this hydration run
+        quiet: Skip the per-batch success line (a progress bar is showing it instead)
+        
+    Returns:
+        List of tweet objects returned by the API, or None if the batch failed
+    """
+    batch_size = len(batch)
+    
+    # Retry loop for rate limits
+    for attempt in range(MAX_RETRIES):
+        wait_for_rate_limit()
+        try:
+            # Make API request with expansions to guarantee relationship fields
+            params = {
+                "tweet_ids": ",".join(batch),
+                "expansions": "referenced_tweets.id,author_id"
+            }
+            acquire_request_slot()
+            try:
+                response = SESSION.get(BASE_URL, params=params, timeout=30)
+            except requests.exceptions.RequestException:
+                release_request_slot(congested=True)
+                raise
+            release_request_slot(congested=response.status_code == 429 or response.status_code >= 500)
+            
+            update_rate_from_headers(response)
+            
+            if response.status_code == 429:
+                if attempt < MAX_RETRIES - 1:  # Not the last attempt
+                    backoff_delay = retry_after_seconds(response)
+                    print(f"⚠️  Rate limited (attempt {attempt + 1}/{MAX_RETRIES}), pausing all requests for {backoff_delay:g} seconds...")
+                    # Pause every worker, not just this one, so in-flight batches stop hitting the limit
+                    pause_requests(backoff_delay)
+                    continue
+                print(f"❌ Rate limited after {MAX_RETRIES} attempts, skipping batch {batch_no}")
+                return None
+            
+            response.raise_for_status()
+            data = response.json()
+            
+            # Process results
+            tweets = data.get("tweets", [])
+            found_count = len(tweets)
+            estimated_credits = max(found_count * CREDITS_PER_TWEET, 15)  # Minimum 15 credits per request
+            if not quiet:
+                print(f"✅ Batch {batch_no}/{total_batches}: found {found_count}/{batch_size} tweets (≈{estimated_credits} credits)")
+            return tweets
+            
+        except requests.exceptions.RequestException as e:
+            if attempt < MAX_RETRIES - 1:
+                print(f"❌ API request failed (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
+                time.sleep(retry_backoff(attempt))
+                continue
+            print(f"❌ API request failed after {MAX_RETRIES} attempts for batch {batch_no}: {e}")
+            return None
+        except json.JSONDecodeError as e:
+            if attempt < MAX_RETRIES - 1:
+                print(f"❌ JSON parse failed (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
+                time.sleep(retry_backoff(attempt))
+                continue
+            print(f"❌ JSON parse failed after {MAX_RETRIES} attempts for batch {batch_no}: {e}")
+            return None
+    
+    return None
+
+def hydrate_tweets(tweet_ids: Sequence[str], batch_size: int = BATCH_SIZE, cache_file: BinaryIO | None = None,
+                   max_workers: int = MAX_WORKERS, not_found_file: BinaryIO | None = None) -> Iterator[Dict[str, Any]]:
     """
     Hydrate tweets using TwitterAPI.io batch endpoint.
     
+    Batches are fetched concurrently by max_workers threads and yielded as they complete.
+    
     Args:
-        tweet_ids: List of tweet ID strings to hydrate
+        tweet_ids: Tweet ID strings to hydrate
+        batch_size: Maximum number of IDs per request
+        cache_file: Open parents.jsonl handle; each successful batch is appended to it
+        max_workers: Maximum number of requests in flight at once
+        not_found_file: Open not_found.jsonl handle; IDs a successful batch didn't return are logged to it
         
     Yields:
         Tweet objects from the API
@@ -340,89 +757,59 @@ def hydrate_tweets(tweet_ids: List[str]) -> Iterator[Dict[str, Any]]:
     if not tweet_ids:
         return
     
-    total_batches = (len(tweet_ids) + BATCH_SIZE - 1) // BATCH_SIZE
-    processed_batches = 0
+    # Spread IDs evenly over the minimum number of requests instead of leaving a stub batch
+    num_batches = -(-len(tweet_ids) // batch_size)
+    # The IDs are already materialized, so slice them directly rather than stepping an iterator
+    tweet_ids = tuple(tweet_ids)
+    per_batch = -(-len(tweet_ids) // num_batches)
+    batches = [tweet_ids[i:i + per_batch] for i in range(0, len(tweet_ids), per_batch)]
+    total_batches = len(batches)
     failed_ids = []
+    reset_concurrency(max_workers)
     
-    for batch in chunks(tweet_ids, BATCH_SIZE):
-        processed_batches += 1
-        batch_size = len(batch)
-        
-        print(f"🔄 Hydrating batch {processed_batches}/{total_batches} ({batch_size} tweets)...")
-        
-        # Retry loop for rate limits
-        success = False
-        for attempt in range(MAX_RETRIES):
-            try:
-                # Make API request with expansions to guarantee relationship fields
-                params = {
-                    "tweet_ids": ",".join(batch),
-                    "expansions": "referenced_tweets.id,author_id"
-                }
-                response = requests.get(BASE_URL, headers=HEADERS, params=params, timeout=30)
-                
-                if response.status_code == 429:
-                    if attempt < MAX_RETRIES - 1:  # Not the last attempt
-                        backoff_delay = RETRY_BACKOFF[attempt]
-                        print(f"⚠️  Rate limited (attempt {attempt + 1}/{MAX_RETRIES}), waiting {backoff_delay} seconds...")
-                        time.sleep(backoff_delay)
-                        continue
-                    else:
-                        print(f"❌ Rate limited after {MAX_RETRIES} attempts, skipping batch")
-                        break
-                    
-                response.raise_for_status()
-                data = response.json()
-                
-                # Process results
-                tweets = data.get("tweets", [])
-                found_count = len(tweets)
-                estimated_credits = max(found_count * CREDITS_PER_TWEET, 15)  # Minimum 15 credits per request
-                
-                # Track failed IDs (requested but not returned)
-                found_ids = {str(tweet.get("id") or tweet.get("id_str")) for tweet in tweets if tweet.get("id") or tweet.get("id_str")}
-                batch_failed = [tid for tid in batch if tid not in found_ids]
-                failed_ids.extend(batch_failed)
-                
-                print(f"✅ Found {found_count}/{batch_size} tweets (≈{estimated_credits} credits)")
-                if batch_failed:
-                    print(f"⚠️  {len(batch_failed)} tweets not found in this batch")
-                
-                for tweet in tweets:
-                    yield tweet
-                
-                success = True
-                break  # Successfully processed, exit retry loop
-                
-            except requests.exceptions.RequestException as e:
-                if attempt < MAX_RETRIES - 1:
-                    print(f"❌ API request failed (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
-                    time.sleep(RETRY_BACKOFF[min(attempt, len(RETRY_BACKOFF) - 1)])
-                    continue
-                else:
-                    print(f"❌ API request failed after {MAX_RETRIES} attempts for batch {processed_batches}: {e}")
-                    break
-            except json.JSONDecodeError as e:
-                if attempt < MAX_RETRIES - 1:
-                    print(f"❌ JSON parse failed (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
-                    time.sleep(RETRY_BACKOFF[min(attempt, len(RETRY_BACKOFF) - 1)])
-                    continue
-                else:
-                    print(f"❌ JSON parse failed after {MAX_RETRIES} attempts for batch {processed_batches}: {e}")
-                    break
-        else:
-            # This executes if the retry loop completed without breaking (all retries exhausted)
-            print(f"❌ All retry attempts exhausted for batch {processed_batches}")
-            failed_ids.extend(batch)
-            continue
-        
-        # If we didn't succeed, mark batch as failed
-        if not success:
-            failed_ids.extend(batch)
+    progress = tqdm(total=total_batches, unit="batch", desc="🔄 Hydrating") if tqdm is not None else None
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, total_batches)) as executor:
+        futures = {
+            executor.submit(fetch_batch, batch, batch_no, total_batches, progress is not None): batch
+            for batch_no, batch in enumerate(batches, 1)
+        }
         
-        # Rate limiting between successful batches
-        if success and processed_batches < total_batches:
-            time.sleep(RATE_LIMIT_DELAY)
+        for future in concurrent.futures.as_completed(futures):
+            batch = futures[future]
+            tweets = future.result()
+            if progress is not None:
+                progress.update(1)
+            
+            # If we didn't succeed, mark batch as failed
+            if tweets is None:
+                failed_ids.extend(batch)
+                if progress is not None:
+                    progress.set_postfix(missing=len(failed_ids))
+                continue
+            
+            # Track failed IDs (requested but not returned)
+            found_ids = set(map(_tweet_key, tweets))
+            batch_failed = list(itertools.filterfalse(found_ids.__contains__, batch))
+            failed_ids.extend(batch_failed)
+            if progress is not None:
+                progress.set_postfix(missing=len(failed_ids))
+            elif batch_failed:
+                print(f"⚠️  {len(batch_failed)} tweets not found in this batch")
+            
+            # Persist the batch right away so an interrupted run keeps what it paid for
+            if cache_file is not None and tweets:
+                append_parents(cache_file, tweets)
+            # Only IDs from answered batches are known missing; failed requests may just be transient
+            if not_found_file is not None and batch_failed:
+                checked_at = int(time.time())
+                append_parents(not_found_file, ({"id": tweet_id, "checked_at": checked_at} for tweet_id in batch_failed))
+            
+            for tweet in tweets:
+                yield tweet
+    
+    if progress is not None:
+        progress.close()
     
     # Save failed IDs to file for audit
     if failed_ids:
@@ -433,88 +820,468 @@ def hydrate_tweets(tweet_ids: List[str]) -> Iterator[Dict[str, Any]]:
         except Exception as e:
             print(f"⚠️  Failed to save failed IDs: {e}")
 
-def extract_parent_ids_from_cleaned_files(cleaned_files: List[pathlib.Path]) -> Set[str]:
+# Cleaned lines have the flat schema written by clean_tweet: "id" is the first key and
+# "linked_tweet_id" follows later on the same line, so one pattern anchored at the line
+# start picks up both. JSON escapes quotes and newlines inside string values, which keeps
+# it from matching text that merely looks like a key or spilling onto the next line.
+_CLEANED_LINE_RE = re.compile(
+    rb'^\{"id":\s*"(\d+)".*?"linked_tweet_id":\s*(?:"(\d+)"|null)',
+    re.MULTILINE,
+)
+
+def _scan_lines_slow(chunk: bytes, first_line_no: int, file_name: str,
+                     parent_ids: Set[str], seen_ids: Set[str]) -> None:
     """
-    Extract all parent tweet IDs from cleaned JSONL files.
+    Fully parse lines the regex fast path couldn't match.
     
     Args:
-        cleaned_files: List of paths to cleaned JSONL files
+        chunk: One or more raw JSONL lines
+        first_line_no: 1-based line number of the first line in chunk (for warnings)
+        file_name: Name of the file being scanned (for warnings)
+        parent_ids: Set to add referenced parent IDs to
+        seen_ids: Set to add contained tweet IDs to
+    """
+    for line_no, line in enumerate(chunk.split(b"\n"), first_line_no):
+        if not line.strip():
+            continue
+        try:
+            obj = json_loads(line)
+        except json.JSONDecodeError:
+            print(f"⚠️  Skipping malformed JSON on line {line_no} in {file_name}")
+            continue
+        
+        # Record the tweet itself so parents already in the export aren't re-fetched
+        tweet_id = obj.get("id")
+        if tweet_id:
+            seen_ids.add(str(tweet_id))
+        
+        # Extract parent IDs from cleaned format
+        linked_tweet_id = obj.get("linked_tweet_id")
+        if linked_tweet_id:
+            parent_ids.add(str(linked_tweet_id))
+
+def scan_jsonl(file_path: pathlib.Path) -> Tuple[Set[str], Set[str]]:
+    """
+    Scan one cleaned JSONL file in a single pass.
+    
+    The file is memory-mapped and matched with one precompiled regex; only lines it
+    can't match (numeric IDs, malformed JSON) go through the JSON parser.
+    
+    Args:
+        file_path: Path to a cleaned JSONL file
         
     Returns:
-        Set of unique parent tweet IDs
+        Tuple of (parent tweet IDs referenced by the file, tweet IDs contained in the file)
     """
-    all_parent_ids = set()
+    parent_ids = set()
+    seen_ids = set()
     
+    with file_path.open("rb") as f:
+        # mmap can't map an empty file
+        if os.fstat(f.fileno()).st_size == 0:
+            return parent_ids, seen_ids
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(mm)
+            pos = 0  # Start of the first line not yet accounted for
+            
+            for match in _CLEANED_LINE_RE.finditer(mm):
+                # Anything the regex skipped over gets the slow path (rare, so the
+                # line-number count below can afford to copy the prefix)
+                if match.start() > pos:
+                    gap = mm[pos:match.start()]
+                    if gap.strip():
+                        _scan_lines_slow(gap, mm[:pos].count(b"\n") + 1, file_path.name, parent_ids, seen_ids)
+                
+                seen_ids.add(match.group(1).decode())
+                if match.group(2):
+                    parent_ids.add(match.group(2).decode())
+                
+                newline = mm.find(b"\n", match.end())
+                pos = end if newline < 0 else newline + 1
+            
+            if pos < end:
+                tail = mm[pos:end]
+                if tail.strip():
+                    _scan_lines_slow(tail, mm[:pos].count(b"\n") + 1, file_path.name, parent_ids, seen_ids)
+    
+    return parent_ids, seen_ids
+
+def _scan_results(cleaned_files: List[pathlib.Path],
+                  cache: Dict[str, Any] | None = None) -> Iterator[Tuple[pathlib.Path, Set[str], Set[str]]]:
+    """
+    Run scan_jsonl over every file, yielding (file_path, parent_ids, seen_ids) as each finishes.
+    
+    Files whose cached results still match their signature are yielded straight from
+    the cache. The rest are independent, so they are scanned in parallel worker
+    processes, largest first so one big file doesn't start last and hold up the whole
+    scan. With a single file or core the scan runs inline rather than paying for a
+    process pool.
+    """
+    to_scan = []
     for file_path in cleaned_files:
-        print(f"📁 Scanning {file_path.name} for parent IDs...")
+        entry = cache["scan"].get(file_path.name) if cache is not None else None
+        if entry and entry["signature"] == file_signature(file_path):
+            print(f"⏭️  Using cached IDs for unchanged {file_path.name}")
+            yield file_path, set(entry["parent_ids"]), set(entry["seen_ids"])
+        else:
+            to_scan.append(file_path)
+    
+    for file_path, parent_ids, seen_ids in _scan_files(to_scan):
+        if cache is not None:
+            cache["scan"][file_path.name] = {
+                "signature": file_signature(file_path),
+                "parent_ids": list(parent_ids),
+                "seen_ids": list(seen_ids),
+            }
+        yield file_path, parent_ids, seen_ids
+
+def _scan_files(cleaned_files: List[pathlib.Path]) -> Iterator[Tuple[pathlib.Path, Set[str], Set[str]]]:
+    """Scan cleaned files with scan_jsonl, in worker processes when there is more than one."""
+    if not cleaned_files:
+        return
+    
+    cleaned_files = sorted(cleaned_files, key=lambda path: path.stat().st_size, reverse=True)
+    max_workers = min(len(cleaned_files), os.cpu_count() or 1)
+    
+    if max_workers <= 1:
+        for file_path in cleaned_files:
+            print(f"📁 Scanning {file_path.name} for parent IDs...")
+            try:
+                parent_ids, seen_ids = scan_jsonl(file_path)
+            except Exception as e:
+                print(f"❌ Failed to read {file_path.name}: {e}")
+                continue
+            yield file_path, parent_ids, seen_ids
+        return
+    
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for file_path in cleaned_files:
+            print(f"📁 Scanning {file_path.name} for parent IDs...")
+            futures[executor.submit(scan_jsonl, file_path)] = file_path
+        
+        for future in concurrent.futures.as_completed(futures):
+            file_path = futures[future]
+            try:
+                parent_ids, seen_ids = future.result()
+            except Exception as e:
+                print(f"❌ Failed to read {file_path.name}: {e}")
+                continue
+            yield file_path, parent_ids, seen_ids
+
+def scan_cleaned_files(cleaned_files: List[pathlib.Path],
+                       cache: Dict[str, Any] | None = None) -> Tuple[Set[str], Set[str], Set[str]]:
+    """
+    Extract parent tweet IDs and contained tweet IDs from cleaned JSONL files.
+    
+    Parent IDs are split into missing and available as each file's results
+    arrive, so no combined parent set is ever built and subtracted.
+    
+    Args:
+        cleaned_files: List of paths to cleaned JSONL files
+        cache: Scan cache from load_scan_cache; unchanged files are read from it
+        
+    Returns:
+        Tuple of (parent IDs missing from the files, parent IDs present in the
+        files, unique tweet IDs present in the files)
+    """
+    missing_ids = set()
+    available_ids = set()
+    seen = set()
+    
+    if not cleaned_files:
+        return missing_ids, available_ids, seen
+    
+    for _, parent_ids, seen_ids in _scan_results(cleaned_files, cache):
+        seen.update(seen_ids)
+            
+        # Parents of this file that an earlier file already contains
+        present = parent_ids & seen
+        available_ids.update(present)
+        missing_ids.update(parent_ids - present)
+        
+        # This file's tweets may be parents that earlier files were missing
+        newly_present = missing_ids & seen_ids
+        if newly_present:
+            missing_ids.difference_update(newly_present)
+            available_ids.update(newly_present)
+    
+    return missing_ids, available_ids, seen
+
+def _tweet_key(tweet: Dict[str, Any]) -> str | None:
+    """Return the tweet's ID as a string, or None if it has none."""
+    tweet_id = tweet.get("id") or tweet.get("id_str")
+    return str(tweet_id) if tweet_id else None
+
+def load_parents_blob(parents_path: pathlib.Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Load a parents.json blob ({id: tweet}).
+    
+    With ijson installed the file is streamed one (id, tweet) pair at a time, so
+    the raw file is never held in memory next to the parsed dict.
+    
+    Args:
+        parents_path: Path to parents.json
+        
+    Returns:
+        Dictionary mapping tweet IDs to tweet data
+    """
+    if ijson is None:
+        return json_loads(parents_path.read_bytes())
+    with parents_path.open("rb") as f:
+        return dict(ijson.kvitems(f, "", use_float=True))
+
+def load_existing_parents(folder: pathlib.Path, ids_only: bool = False) -> Dict[str, Any]:
+    """
+    Load existing parent tweets from parents.jsonl, migrating a legacy parents.json if needed.
+    
+    Args:
+        folder: Folder containing parents.jsonl / parents.json
+        ids_only: Keep each tweet's byte offset in parents.jsonl instead of the parsed
+            tweet. Enough to skip already-hydrated IDs, and memory then grows with the
+            number of IDs rather than the size of the cache.
         
+    Returns:
+        Dictionary mapping tweet IDs to tweet data (or to line offsets with ids_only;
+        offsets refer to the file as read and are stale once it has been compacted)
+    """
+    cache_path = folder / "parents.jsonl"
+    legacy_path = folder / "parents.json"
+    
+    if not cache_path.exists():
+        if not legacy_path.exists():
+            return {}
+        
+        try:
+            existing = load_parents_blob(legacy_path)
+        except Exception as e:
+            print(f"⚠️  Failed to load existing parents.json: {e}")
+            return {}
+        
+        # One-time migration so later runs only ever append
         try:
-            content = file_path.read_text(encoding="utf-8")
-            for line_no, line in enumerate(content.splitlines(), 1):
+            with cache_path.open("ab") as f:
+                append_parents(f, existing.values())
+            print(f"📦 Migrated {len(existing)} tweets from parents.json to {cache_path.name}")
+        except Exception as e:
+            print(f"⚠️  Failed to migrate parents.json to {cache_path.name}: {e}")
+        return existing
+    
+    existing = {}
+    stale_lines = 0  # Malformed, ID-less or superseded lines that a rewrite would drop
+    offset = 0
+    try:
+        with cache_path.open("rb", buffering=READ_BUFFER_SIZE) as f:
+            for line_no, line in enumerate(f, 1):
+                line_offset = offset
+                offset += len(line)
                 if not line.strip():
                     continue
-                
                 try:
-                    obj = json.loads(line)
-                    
-                    # Extract parent IDs from cleaned format
-                    linked_tweet_id = obj.get("linked_tweet_id")
-                    if linked_tweet_id:
-                        all_parent_ids.add(str(linked_tweet_id))
-                        
+                    tweet = json_loads(line)
                 except json.JSONDecodeError:
-                    print(f"⚠️  Skipping malformed JSON on line {line_no} in {file_path.name}")
+                    # Most likely the tail of an interrupted append
+                    print(f"⚠️  Skipping malformed JSON on line {line_no} in {cache_path.name}")
+                    stale_lines += 1
                     continue
-                    
-        except Exception as e:
-            print(f"❌ Failed to read {file_path.name}: {e}")
-            continue
+                tweet_id = _tweet_key(tweet)
+                if not tweet_id:
+                    stale_lines += 1
+                    continue
+                if tweet_id in existing:
+                    stale_lines += 1
+                existing[tweet_id] = line_offset if ids_only else tweet
+        print(f"📖 Loaded {len(existing)} existing tweets from {cache_path.name}")
+        
+        if stale_lines:
+            compact_parents_cache(cache_path, existing, offsets=ids_only)
+    except Exception as e:
+        print(f"⚠️  Failed to load existing {cache_path.name}: {e}")
+    return existing
+
+def load_not_found_ids(folder: pathlib.Path) -> Set[str]:
+    """
+    Load IDs the API recently reported as not found, so deleted or protected tweets
+    aren't paid for again on every run.
     
-    return all_parent_ids
+    Args:
+        folder: Folder containing not_found.jsonl
+        
+    Returns:
+        Set of tweet IDs checked within the last NOT_FOUND_RETRY_DAYS days
+    """
+    not_found_path = folder / NOT_FOUND_CACHE_NAME
+    if not not_found_path.exists():
+        return set()
+    
+    cutoff = time.time() - NOT_FOUND_RETRY_DAYS * 86400
+    not_found_ids = set()
+    try:
+        with not_found_path.open("rb", buffering=READ_BUFFER_SIZE) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json_loads(line)
+                except json.JSONDecodeError:
+                    continue  # Tail of an interrupted append
+                if entry.get("checked_at", 0) >= cutoff and entry.get("id"):
+                    not_found_ids.add(entry["id"])
+    except Exception as e:
+        print(f"⚠️  Failed to load {not_found_path.name}: {e}")
+    return not_found_ids
 
-def load_existing_parents() -> Dict[str, Dict[str, Any]]:
+def compact_parents_cache(cache_path: pathlib.Path, parents: Dict[str, Any], offsets: bool = False) -> None:
     """
-    Load existing parent tweets from parents.json if it exists.
+    Rewrite parents.jsonl with one line per tweet, swapping it in atomically.
+    
+    Args:
+        cache_path: Path to parents.jsonl
+        parents: Dictionary mapping tweet IDs to tweet data
+        offsets: parents maps IDs to line offsets (see load_existing_parents), so the
+            kept lines are copied over as-is instead of being re-encoded
+    """
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        with tmp_path.open("wb") as f:
+            if offsets:
+                with cache_path.open("rb") as src, mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for start in parents.values():
+                        end = mm.find(b"\n", start)
+                        # Only the last line can lack its newline
+                        f.write(mm[start:end + 1] if end >= 0 else mm[start:] + b"\n")
+            else:
+                append_parents(f, parents.values())
+        os.replace(tmp_path, cache_path)
+        print(f"🧹 Compacted {cache_path.name} to {len(parents)} tweets")
+    except Exception as e:
+        print(f"⚠️  Failed to compact {cache_path.name}: {e}")
+
+def open_parents_cache(cache_path: pathlib.Path) -> BinaryIO:
+    """
+    Open parents.jsonl for appending.
+    
+    If a previous run was interrupted mid-line, a newline is written first so the
+    next record starts on its own line.
     
+    Args:
+        cache_path: Path to parents.jsonl
+        
     Returns:
-        Dictionary mapping tweet IDs to tweet data
+        Binary file handle opened in append mode
+    """
+    cache_file = cache_path.open("ab")
+    if cache_file.tell() > 0:
+        with cache_path.open("rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                cache_file.write(b"\n")
+    return cache_file
+
+def append_parents(cache_file: BinaryIO, tweets: Iterable[Dict[str, Any]]) -> None:
+    """
+    Append tweets to parents.jsonl, one JSON object per line.
+    
+    Args:
+        cache_file: Binary file handle opened in append mode
+        tweets: Tweet objects to append
+    """
+    cache_file.writelines([json_dumps_line(tweet) for tweet in tweets])
+    cache_file.flush()
+
+def save_parents(parents: Dict[str, Dict[str, Any]], parents_path: pathlib.Path = pathlib.Path("parents.json")) -> None:
     """
-    parents_file = pathlib.Path("parents.json")
-    if not parents_file.exists():
-        return {}
+    Export parent tweets to a single parents.json (used by --export-json).
     
+    The file is written to a temporary sibling first and then swapped into place,
+    so an interrupted run never leaves a truncated parents.json behind.
+    
+    Args:
+        parents: Dictionary mapping tweet IDs to tweet data
+        parents_path: Destination file
+    """
+    tmp_path = parents_path.with_name(parents_path.name + ".tmp")
     try:
-        with parents_file.open("r", encoding="utf-8") as f:
-            existing = json.load(f)
-        print(f"📖 Loaded {len(existing)} existing tweets from parents.json")
-        return existing
+        if orjson is not None:
+            tmp_path.write_bytes(orjson.dumps(parents, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            with tmp_path.open("w", encoding="utf-8") as f:
+                json.dump(parents, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, parents_path)
+        print(f"💾 Saved {len(parents)} tweets to {parents_path}")
     except Exception as e:
-        print(f"⚠️  Failed to load existing parents.json: {e}")
-        return {}
+        print(f"❌ Failed to save {parents_path}: {e}")
 
-def save_parents(parents: Dict[str, Dict[str, Any]]) -> None:
+def save_parents_columnar(parents: Dict[str, Dict[str, Any]], columnar_path: pathlib.Path) -> None:
     """
-    Save parent tweets to parents.json.
+    Export parent tweets column by column instead of one object per tweet.
+    
+    The output is {"ids": [...], "<field>": [...], ...} with one list per top-level
+    tweet field, all aligned with "ids" (None where a tweet lacks the field), so
+    repeated keys are stored once and a consumer can load just the columns it needs.
     
     Args:
         parents: Dictionary mapping tweet IDs to tweet data
+        columnar_path: Destination file
     """
+    # Keep fields in first-seen order so the layout is stable between runs
+    fields = list(dict.fromkeys(field for tweet in parents.values() for field in tweet))
+    tweets = list(parents.values())
+    columns = {"ids": list(parents)}
+    for field in fields:
+        columns[field] = [tweet.get(field) for tweet in tweets]
+    
+    tmp_path = columnar_path.with_name(columnar_path.name + ".tmp")
     try:
-        with open("parents.json", "w", encoding="utf-8") as f:
-            json.dump(parents, f, indent=2, ensure_ascii=False)
-        print(f"💾 Saved {len(parents)} tweets to parents.json")
+        if orjson is not None:
+            tmp_path.write_bytes(orjson.dumps(columns, option=orjson.OPT_NON_STR_KEYS))
+        else:
+            with tmp_path.open("w", encoding="utf-8") as f:
+                json.dump(columns, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, columnar_path)
+        print(f"💾 Saved {len(parents)} tweets ({len(fields)} columns) to {columnar_path}")
     except Exception as e:
-        print(f"❌ Failed to save parents.json: {e}")
+        print(f"❌ Failed to save {columnar_path}: {e}")
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Clean Twitter exports and hydrate parent tweets via TwitterAPI.io")
+    parser.add_argument("--folder", type=str,
+                        help="Folder containing Twitter export files (skips the GUI folder picker)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Maximum tweet IDs per API request (default: {BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help=f"Maximum hydration requests in flight at once (default: {MAX_WORKERS})")
+    parser.add_argument("--export-json", action="store_true",
+                        help="Also write every cached tweet to parents.json")
+    parser.add_argument("--retry-not-found", action="store_true",
+                        help=f"Re-request IDs the API reported missing in the last {NOT_FOUND_RETRY_DAYS} days")
+    parser.add_argument("--columnar", action="store_true",
+                        help="Also write every cached tweet to a column-oriented parents_columnar.json")
+    args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    return args
 
 def main():
+    global SESSION
+    args = parse_args()
+    if args.workers != MAX_WORKERS:
+        # Size the connection pool to the requested concurrency
+        SESSION = create_session(args.workers)
+    
     print("🚀 TwitterAPI.io Parent & Quoted Tweet Hydrator")
     print("🧹 Now with file cleaning functionality!")
     print("=" * 60)
     
     # Step 0: Get folder and clean input files
     print("\n📁 Step 0: Selecting folder and cleaning input files...")
-    folder = get_folder_path()
-    cleaned_files = find_and_clean_files(folder)
+    folder = get_folder_path(args.folder)
+    scan_cache = load_scan_cache(folder)
+    cleaned_files = find_and_clean_files(folder, scan_cache)
     
     if not cleaned_files:
         print("❌ No files were successfully cleaned. Exiting.")
@@ -522,34 +1289,64 @@ def main():
     
     print(f"✅ Successfully cleaned {len(cleaned_files)} files")
     
-    # Step 1: Extract parent IDs from cleaned JSONL files  
-    print("\n📋 Step 1: Extracting parent tweet IDs from cleaned files...")
-    all_parent_ids = extract_parent_ids_from_cleaned_files(cleaned_files)
-    
-    if not all_parent_ids:
-        print("ℹ️  No parent tweet IDs found in cleaned files")
-        return
-    
-    print(f"📊 Found {len(all_parent_ids)} unique parent tweet IDs")
-    
-    # Step 2: Load existing tweets to avoid re-hydrating
-    print("\n📖 Step 2: Loading existing tweets...")
-    existing_tweets = load_existing_parents()
+    # Steps 1 & 2 overlap: existing tweets load in a background thread while the
+    # worker processes scan the cleaned files
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as loader:
+        # Step 2: Load existing tweets to avoid re-hydrating
+        print("\n📖 Step 2: Loading existing tweets in the background...")
+        # Without an export, only the IDs are needed, not the tweets themselves
+        existing_future = loader.submit(load_existing_parents, folder,
+                                        not (args.export_json or args.columnar))
+        
+        # Step 1: Extract parent IDs from cleaned JSONL files  
+        print("\n📋 Step 1: Extracting parent tweet IDs from cleaned files...")
+        missing_parent_ids, available_ids, all_seen_ids = scan_cleaned_files(cleaned_files, scan_cache)
+        save_scan_cache(folder, scan_cache)
+        
+        if not missing_parent_ids and not available_ids:
+            print("ℹ️  No parent tweet IDs found in cleaned files")
+            return
+        
+        print(f"📊 Found {len(missing_parent_ids) + len(available_ids)} unique parent tweet IDs")
+        
+        # Parents that are themselves in the export are already available to the processor
+        if available_ids:
+            print(f"ℹ️  {len(available_ids)} parent tweets are already present in the input files")
+        
+        existing_tweets = existing_future.result()
     
     # Step 3: Hydrate tweets recursively (parents + quoted tweets)
     print("\n🔄 Step 3: Hydrating tweets with quoted tweet detection...")
     
     # Start with parent IDs that aren't already hydrated
-    ids_to_process = [tid for tid in all_parent_ids if tid not in existing_tweets]
+    # difference() with the dict itself probes it only for the (usually much smaller)
+    # missing set, instead of walking every key of a large parents.json
+    missing_parent_ids = missing_parent_ids.difference(existing_tweets)
+    
+    # Skip IDs a recent run already paid to learn are gone
+    not_found_ids = set() if args.retry_not_found else load_not_found_ids(folder)
+    if not_found_ids:
+        before = len(missing_parent_ids)
+        missing_parent_ids.difference_update(not_found_ids)
+        if skipped := before - len(missing_parent_ids):
+            print(f"ℹ️  Skipping {skipped} tweets the API reported missing in the last {NOT_FOUND_RETRY_DAYS} days")
+    ids_to_process = list(missing_parent_ids)
+    requested_ids = set(ids_to_process)  # Everything sent to the API, found or not
     all_new_tweets = {}
+    parent_count = 0
+    quoted_count = 0
     max_depth = 3  # Limit recursion depth
     current_depth = 0
     
     if not ids_to_process:
-        print("ℹ️  All parent tweets already exist in parents.json")
+        print("ℹ️  All parent tweets already exist in parents.jsonl or the input files")
     else:
         print(f"🆕 Need to hydrate {len(ids_to_process)} new parent tweets")
     
+    cache_path = folder / "parents.jsonl"
+    cache_file = open_parents_cache(cache_path) if ids_to_process else None
+    not_found_file = open_parents_cache(folder / NOT_FOUND_CACHE_NAME) if ids_to_process else None
+    
     while ids_to_process and current_depth < max_depth:
         current_depth += 1
         print(f"\n🔍 Depth {current_depth}: Processing {len(ids_to_process)} tweet IDs...")
@@ -559,24 +1356,29 @@ def main():
         else:
             print("   (Quoted tweets from previous level)")
         
-        # Hydrate current batch
-        new_tweets = []
-        for tweet in hydrate_tweets(ids_to_process):
-            tweet_id = str(tweet.get("id") or tweet.get("id_str"))
+        # Hydrate current batch, collecting quoted tweet IDs as tweets arrive. At the
+        # last depth their quotes would never be fetched, so don't look for them.
+        collect_quotes = current_depth < max_depth
+        quoted_ids = set()
+        hydrated_count = 0
+        for tweet in hydrate_tweets(ids_to_process, args.batch_size, cache_file, args.workers, not_found_file):
+            tweet_id = _tweet_key(tweet)
             if tweet_id:
                 all_new_tweets[tweet_id] = tweet
-                new_tweets.append(tweet)
-        
-        print(f"✅ Hydrated {len(new_tweets)} tweets at depth {current_depth}")
+                hydrated_count += 1
+                if tweet_id in missing_parent_ids:
+                    parent_count += 1
+                else:
+                    quoted_count += 1
+                if collect_quotes:
+                    extract_quoted_tweet_ids(tweet, quoted_ids)
         
-        # Extract quoted tweet IDs from newly hydrated tweets
-        quoted_ids = extract_quoted_tweet_ids(new_tweets)
+        print(f"✅ Hydrated {hydrated_count} tweets at depth {current_depth}")
         
-        # Filter out already hydrated quoted tweets
-        quoted_to_fetch = [
-            qid for qid in quoted_ids 
-            if qid not in existing_tweets and qid not in all_new_tweets
-        ]
+        # Filter out quoted tweets we already have or already asked for; IDs the API
+        # couldn't return at an earlier depth or a recent run would only cost credits again
+        quoted_to_fetch = list(quoted_ids.difference(existing_tweets, all_new_tweets, all_seen_ids, requested_ids, not_found_ids))
+        requested_ids.update(quoted_to_fetch)
         
         if quoted_to_fetch:
             print(f"🔗 Found {len(quoted_to_fetch)} quoted tweets to fetch next")
@@ -584,26 +1386,27 @@ def main():
         # Prepare for next iteration
         ids_to_process = quoted_to_fetch
     
-    # Step 4: Merge and save results
-    print(f"\n💾 Step 4: Saving results to {folder / 'parents.json'}...")
-    all_tweets = {**existing_tweets, **all_new_tweets}
+    if cache_file is not None:
+        cache_file.close()
+    if not_found_file is not None:
+        not_found_file.close()
+    
+    # Step 4: Report results (new tweets were already appended batch by batch)
+    print(f"\n💾 Step 4: Results saved to {cache_path}")
+    total_tweets = len(existing_tweets) + len(all_new_tweets)
+    
+    if args.export_json or args.columnar:
+        all_tweets = {**existing_tweets, **all_new_tweets}
+        if args.export_json:
+            save_parents(all_tweets, folder / "parents.json")
+        if args.columnar:
+            save_parents_columnar(all_tweets, folder / "parents_columnar.json")
     
     if all_new_tweets:
-        # Save parents.json to the selected folder
-        parents_path = folder / "parents.json"
-        try:
-            with parents_path.open("w", encoding="utf-8") as f:
-                json.dump(all_tweets, f, indent=2, ensure_ascii=False)
-            print(f"💾 Saved {len(all_tweets)} tweets to {parents_path}")
-        except Exception as e:
-            print(f"❌ Failed to save {parents_path}: {e}")
-        
         print(f"✅ Successfully hydrated {len(all_new_tweets)} new tweets")
-        print(f"📊 Total tweets in parents.json: {len(all_tweets)}")
+        print(f"📊 Total tweets in {cache_path.name}: {total_tweets}")
         
         # Show breakdown
-        parent_count = len([tid for tid in all_new_tweets if tid in all_parent_ids])
-        quoted_count = len(all_new_tweets) - parent_count
         if quoted_count > 0:
             print(f"   - Direct parents: {parent_count}")
             print(f"   - Quoted tweets: {quoted_count}")
@@ -614,7 +1417,11 @@ def main():
     print(f"📁 Output files saved to: {folder}")
     print(f"   - Cleaned files: {[f.name for f in cleaned_files]}")
     if all_new_tweets:
-        print(f"   - Parent tweets: parents.json")
+        print(f"   - Parent tweets: {cache_path.name}")
+    if args.export_json:
+        print("   - Parent tweets (JSON export): parents.json")
+    if args.columnar:
+        print("   - Parent tweets (columnar export): parents_columnar.json")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
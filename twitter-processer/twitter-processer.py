@@ -30,7 +30,7 @@ The script will find Twitter data files in the selected folder:
 - likes_*.jsonl (from Firefox extension or Twitter export)
 - bookmarks_*.jsonl (from Firefox extension or Twitter export)
 - replies_*.jsonl (from Firefox extension or Twitter export)
-- parents.json (optional, generated by hydrate_parents_api.py)
+- parents.jsonl or parents.json (optional, generated by hydrate_parents_api.py)
 
 Self-Identification
 -------------------
@@ -54,9 +54,14 @@ Dependencies
 Python 3.10+ with the following external packages:
 - requests (for URL metadata fetching)
 - beautifulsoup4 (for HTML parsing)  
+- lxml (for faster HTML parsing - optional)
+- selectolax (for much faster title/description extraction - optional)
 - google-genai (for image captioning via Gemini API)
 - python-dotenv (for loading .env file with API keys - optional)
-- tkinter (for GUI folder picker - may not be available in headless environments)
+- orjson (for faster JSON parsing - optional)
+- ijson (for streaming a large parents.json - optional)
+- pyahocorasick (for faster URL replacement with large URL mappings - optional)
+- tkinter (for GUI folder picker - optional, only loaded when --folder is not given)
 
 Environment Setup
 -----------------
@@ -69,24 +74,30 @@ Alternatively, set the GEMINI_API_KEY environment variable manually.
 import json
 import re
 import sys
-import tkinter as tk
 import pathlib
 import csv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
 import mimetypes
 import hashlib
+import functools
+import operator
 import time
+import random
+import email.utils
+import threading
 import argparse
+import concurrent.futures
 import urllib.parse
 import socket
 import ipaddress
 import os
 import html
 from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
-from tkinter import filedialog, messagebox
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterator, List
 try:
     from dotenv import load_dotenv
 except ImportError:
@@ -98,26 +109,61 @@ except Exception as e:
     genai = None
     types = None
     _genai_import_error = e
+# orjson is optional; it parses bytes directly and is several times faster than json.
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so existing handlers still apply.
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+try:
+    import ijson
+except ImportError:
+    ijson = None
+# pyahocorasick is optional; it matches thousands of literal URLs in one pass where a
+# regex alternation tries each one at every position
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+# selectolax is optional; its Lexbor-based parser pulls out a title and two meta tags
+# many times faster than building a BeautifulSoup tree
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
 from bs4 import BeautifulSoup
+# lxml is optional; BeautifulSoup's lxml tree builder is a C parser and several times
+# faster than the pure-Python html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
 
 CLIENT = None
+_client_lock = threading.Lock()  # Caption worker threads may all ask for the client at once
 
 def get_client():
     """Get Gemini client, initializing on first call."""
     global CLIENT
-    if CLIENT is None:
-        if genai is None:
-            raise RuntimeError(f"Google GenAI not available: {_genai_import_error}")
-        
-        # Load environment variables from .env file if available
-        if load_dotenv is not None:
-            load_dotenv()
-        elif not os.getenv('GEMINI_API_KEY'):
-            print("⚠️  python-dotenv not installed. Install with: pip install python-dotenv")
-            print("💡  Alternatively, set GEMINI_API_KEY environment variable manually")
-        
-        CLIENT = genai.Client()  # reads GEMINI_API_KEY from environment
-    return CLIENT
+    if CLIENT is not None:
+        return CLIENT  # Fast path: skip the lock once the client exists
+    with _client_lock:
+        if CLIENT is None:
+            if genai is None:
+                raise RuntimeError(f"Google GenAI not available: {_genai_import_error}")
+            
+            # Load environment variables from .env file if available
+            if load_dotenv is not None:
+                load_dotenv()
+            elif not os.getenv('GEMINI_API_KEY'):
+                print("⚠️  python-dotenv not installed. Install with: pip install python-dotenv")
+                print("💡  Alternatively, set GEMINI_API_KEY environment variable manually")
+            
+            CLIENT = genai.Client()  # reads GEMINI_API_KEY from environment
+        return CLIENT
 
 # Regex for Twitter image URLs (only pbs.twimg.com URLs with query params)
 # Note: We deliberately exclude t.co URLs from this regex because we rely on 
@@ -128,7 +174,32 @@ IMG_RE = re.compile(r"https://pbs\.twimg\.com/(?:media/\S+(?:\?format=(?:jpe?g|p
 URL_RE = re.compile(r"https?://(?!pbs\.twimg\.com|t\.co)[^\s)\],>\"']+")
 
 # Common file extensions to exclude (will filter these out separately)
-EXCLUDE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.pdf', '.zip', '.tar', '.gz', '.rar', '.exe', '.dmg'}
+# A tuple so str.endswith can check them all in one call
+EXCLUDE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.pdf', '.zip', '.tar', '.gz', '.rar', '.exe', '.dmg')
+
+# 1 MiB buffer for streaming large JSONL inputs and text exports
+READ_BUFFER_SIZE = 1 << 20
+
+# URL metadata and images are fetched over one shared session, so connections to the
+# same host (pbs.twimg.com in particular) are kept alive instead of re-doing TCP/TLS
+# setup for every URL
+URL_FETCH_WORKERS = 16                         # Concurrent URL metadata fetches
+URL_POOL_HOSTS = 32                            # Distinct hosts whose connection pools are kept
+URL_PER_HOST_FETCHES = 4                       # Concurrent URL metadata fetches allowed against one host
+IMAGE_CAPTION_WORKERS = 8                      # Concurrent image download + Gemini caption calls
+IMAGE_RETRIES = 3                              # Extra attempts for a transient image download or Gemini failure
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}  # HTTP statuses worth retrying; other errors are final
+URL_HEAD_MAX_BYTES = 256 * 1024                # Stop reading a page after this much if </head> hasn't appeared
+URL_RETRY_BACKOFF_MAX = 30                     # Cap in seconds for URL/image retry waits
+URL_FETCH_TIMEOUT = (3.05, 10)                 # (connect, read) seconds, so a dead host can't hold a worker for long
+IMAGE_HASH_INDEX_NAME = "url_hashes.json"      # Sidecar in the image cache mapping image URL -> sha1 of its bytes
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+# urllib3 lists br only when a Brotli package is installed, so we never ask for an encoding it can't decode
+HTTP_SESSION.headers['Accept-Encoding'] = ACCEPT_ENCODING
+# max_retries=0: fetch_url_metadata and describe_image do their own retries with backoff
+HTTP_SESSION.mount('http://', HTTPAdapter(pool_connections=URL_POOL_HOSTS, pool_maxsize=URL_FETCH_WORKERS, max_retries=0))
+HTTP_SESSION.mount('https://', HTTPAdapter(pool_connections=URL_POOL_HOSTS, pool_maxsize=URL_FETCH_WORKERS, max_retries=0))
 
 # --------------------------------------------------------------------------- #
 #  Image Caption Processing Controls                                          #
@@ -147,7 +218,7 @@ ENABLE_CAPTIONS_REPLIES = False  # Disable captioning for replies/parent context
 # --------------------------------------------------------------------------- #
 
 def find_files_in_folder(folder: Path) -> tuple[Path | None, Path | None, Path | None, Path | None, Path | None]:
-    """Find cleaned_*.jsonl files and parents.json files in the given folder.
+    """Find cleaned_*.jsonl files and the parents.jsonl/parents.json file in the given folder.
     
     Returns:
         Tuple of (tweets_file, likes_file, bookmarks_file, replies_file, parents_file) or None if not found
@@ -178,10 +249,12 @@ def find_files_in_folder(folder: Path) -> tuple[Path | None, Path | None, Path |
         replies_file = file
         break
     
-    # Look for parents.json
-    parents_path = folder / "parents.json"
-    if parents_path.exists():
-        parents_file = parents_path
+    # Look for parents.jsonl (append-only cache), falling back to a legacy/exported parents.json
+    for name in ("parents.jsonl", "parents.json"):
+        parents_path = folder / name
+        if parents_path.exists():
+            parents_file = parents_path
+            break
     
     return tweets_file, likes_file, bookmarks_file, replies_file, parents_file
 
@@ -203,12 +276,13 @@ def parse_twitter_jsonl(file_path: Path, file_type: str, self_ids: set = None) -
     if self_ids is None:
         self_ids = set()
 
-    with file_path.open('r', encoding='utf-8') as infile:
+    # Stream raw bytes a line at a time; the JSON parser decodes UTF-8 itself
+    with file_path.open('rb', buffering=READ_BUFFER_SIZE) as infile:
         for line_no, line in enumerate(infile, 1):
             if not line.strip():
                 continue
             try:
-                obj = json.loads(line)
+                obj = json_loads(line)
                 tweet_id = obj.get("id")
                 if not tweet_id:
                     continue
@@ -274,70 +348,126 @@ def parse_twitter_jsonl(file_path: Path, file_type: str, self_ids: set = None) -
     return records, text_lookup, {}, {}, meta_by_id
 
 
+# Nested locations of the author's handle, in order of likelihood
+_USERNAME_PATHS = (
+    ('core', 'user_results', 'result', 'core', 'screen_name'),    # GraphQL-style core structure
+    ('core', 'user_results', 'result', 'legacy', 'screen_name'),
+    ('user', 'screen_name'),                                      # Legacy top-level user object
+    ('legacy', 'user', 'screen_name'),                            # User object inside legacy
+    ('author', 'userName'),                                       # TwitterAPI.io format
+)
+
+def _dig(obj, path):
+    """Follow path of keys into nested dicts, returning None if any step is missing."""
+    try:
+        return functools.reduce(operator.getitem, path, obj)
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
 def extract_author_username(tweet_data, author_id=None):
     """Extract author username from various Twitter API response formats."""
-    # Try all possible paths in order of likelihood
-    paths = [
-        # API v2 includes section - match by author_id if available
-        lambda d, aid: next((user.get('username') for user in d.get('includes', {}).get('users', []) 
-                            if aid and user.get('id') == aid), None),
-        # GraphQL-style core structure
-        lambda d, aid: d.get('core', {}).get('user_results', {}).get('result', {}).get('core', {}).get('screen_name'),
-        lambda d, aid: d.get('core', {}).get('user_results', {}).get('result', {}).get('legacy', {}).get('screen_name'),
-        # Legacy top-level user object
-        lambda d, aid: d.get('user', {}).get('screen_name'),
-        # User object inside legacy
-        lambda d, aid: d.get('legacy', {}).get('user', {}).get('screen_name'),
-        # TwitterAPI.io format
-        lambda d, aid: d.get('author', {}).get('userName'),
-    ]
-    
-    for path in paths:
+    # API v2 includes section - match by author_id if available
+    if author_id:
         try:
-            username = path(tweet_data, author_id)
-            if username:
-                return username
-        except (KeyError, IndexError, TypeError, AttributeError):
-            continue
+            for user in tweet_data['includes']['users']:
+                if user.get('id') == author_id and user.get('username'):
+                    return user['username']
+        except (KeyError, TypeError, AttributeError):
+            pass
+    
+    for path in _USERNAME_PATHS:
+        username = _dig(tweet_data, path)
+        if username:
+            return username
     return ""
 
 
+_MONTHS = {month: number for number, month in enumerate(
+    ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), 1)}
+
+def parse_twitter_date(created_at: str) -> datetime:
+    """Parse Twitter's created_at format, e.g. "Wed Oct 10 20:19:24 +0000 2018".
+    
+    The fields sit at fixed offsets, so UTC timestamps (all the API emits) are sliced
+    out directly instead of going through strptime's format interpretation. Anything
+    else falls back to strptime.
+    """
+    if len(created_at) == 30 and created_at[19:26] == " +0000 ":
+        try:
+            return datetime(int(created_at[26:30]), _MONTHS[created_at[4:7]], int(created_at[8:10]),
+                            int(created_at[11:13]), int(created_at[14:16]), int(created_at[17:19]),
+                            tzinfo=timezone.utc)
+        except (KeyError, ValueError):
+            pass
+    return datetime.strptime(created_at, '%a %b %d %H:%M:%S %z %Y')
+
+
+def iter_parent_tweets(parents_file: Path) -> Iterator[tuple[str, Dict[str, Any]]]:
+    """Yield (tweet_id, tweet) pairs from parents.jsonl or parents.json one at a time.
+    
+    parents.jsonl is read line by line, and a parents.json blob is streamed with ijson
+    when it is installed, so only the tweet being converted is held in memory rather
+    than the whole parent table. In parents.jsonl a re-appended ID comes later and so
+    overwrites the earlier entry when the caller stores it.
+    """
+    if parents_file.suffix == '.jsonl':
+        with parents_file.open('rb', buffering=READ_BUFFER_SIZE) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    tweet_data = json_loads(line)
+                except json.JSONDecodeError:
+                    continue
+                tweet_id = tweet_data.get('id') or tweet_data.get('id_str')
+                if tweet_id:
+                    yield str(tweet_id), tweet_data
+    elif ijson is not None:
+        with parents_file.open('rb') as f:
+            yield from ijson.kvitems(f, '', use_float=True)
+    else:
+        yield from json_loads(parents_file.read_bytes()).items()
+
+
 def load_parents_json(parents_file: Path) -> tuple[Dict[str, str], Dict[str, str], Dict[str, Dict[str, Any]]]:
-    """Load parent tweets from parents.json and convert to lookup formats.
+    """Load parent tweets from parents.jsonl or parents.json and convert to lookup formats.
+    
+    Only the extracted text, URL mappings and relationship metadata are kept; each
+    full tweet object is dropped once it has been converted.
     
     Returns:
         Tuple of (parent_lookup, parent_url_mappings, parent_metadata)
     """
     try:
-        with parents_file.open('r', encoding='utf-8') as f:
-            parents_data = json.load(f)
-        
         # Convert Twitter API v2 format to our lookup format
         parent_lookup = {}
         parent_url_mappings = {}
         parent_metadata = {}
         
-        for tweet_id, tweet_data in parents_data.items():
+        for tweet_id, tweet_data in iter_parent_tweets(parents_file):
+            # Look up the v1.1 legacy object once; every fallback below reads from it
+            legacy = tweet_data.get('legacy') or {}
+            
             # Extract text from Twitter API response - handle both v2 and v1.1 formats
             text = (tweet_data.get('text')
-                    or tweet_data.get('legacy', {}).get('full_text')
-                    or tweet_data.get('legacy', {}).get('text')
+                    or legacy.get('full_text')
+                    or legacy.get('text')
                     or "")
             if text:
                 parent_lookup[tweet_id] = text
             
             # Extract URL mappings from entities when available - handle both v2 and v1.1 formats
             entities = (tweet_data.get('entities')
-                        or tweet_data.get('legacy', {}).get('entities')
+                        or legacy.get('entities')
                         or {})
-            for url_entity in entities.get('urls', []):
-                short = url_entity.get('url', '')
-                expanded = url_entity.get('expanded_url', '')
-                if short and expanded:
-                    parent_url_mappings[short] = expanded
+            parent_url_mappings.update(
+                (short, expanded) for url_entity in entities.get('urls') or ()
+                if (short := url_entity.get('url')) and (expanded := url_entity.get('expanded_url'))
+            )
             
             # Extract relationship metadata for context chain building
-            referenced_tweets = tweet_data.get('referenced_tweets', [])
+            referenced_tweets = tweet_data.get('referenced_tweets') or ()
             reply_to = ""
             quoted = ""
             
@@ -349,7 +479,6 @@ def load_parents_json(parents_file: Path) -> tuple[Dict[str, str], Dict[str, str
             
             # ISSUE #1 FIX: Fallback to legacy fields if referenced_tweets is empty or missing relationships
             if not reply_to or not quoted:
-                legacy = tweet_data.get('legacy', {})
                 if not reply_to:
                     legacy_reply_id = legacy.get('in_reply_to_status_id_str')
                     if legacy_reply_id:
@@ -361,13 +490,12 @@ def load_parents_json(parents_file: Path) -> tuple[Dict[str, str], Dict[str, str
                         quoted = str(legacy_quoted_id)
             
             # Extract author information using the simplified helper function
-            author_id = tweet_data.get('author_id') or tweet_data.get('legacy', {}).get('user_id_str')
+            author_id = tweet_data.get('author_id') or legacy.get('user_id_str')
             author_username = extract_author_username(tweet_data, author_id)
             
             # Also get reply_to_user from legacy if available
             reply_to_user = ""
             if reply_to:
-                legacy = tweet_data.get('legacy', {})
                 reply_to_user = legacy.get('in_reply_to_screen_name', '')
             
             # Store metadata for relationship traversal
@@ -392,38 +520,25 @@ def load_parents_json(parents_file: Path) -> tuple[Dict[str, str], Dict[str, str
         return {}, {}, {}
 
 
-
-def get_thread_context(tweet_id: str, tweet_lookup: Dict[str, str], max_depth: int = 3, visited: set = None) -> List[str]:
-    """
-    Get thread context for a tweet, following parent relationships up to max_depth.
+def parse_input_files(jobs: Dict[str, tuple]) -> Dict[str, Any]:
+    """Run the input parsers concurrently, one worker process per file.
     
-    Args:
-        tweet_id: The starting tweet ID
-        tweet_lookup: Dictionary mapping tweet IDs to tweet content
-        max_depth: Maximum depth to traverse (default 3 to prevent infinite chains)
-        visited: Set of already visited tweet IDs to prevent cycles
+    The files are independent, so they parse in parallel; callers merge the results
+    afterwards in their own priority order. A single file is parsed inline.
     
+    Args:
+        jobs: Mapping of job name to (parser function, argument tuple)
+        
     Returns:
-        List of tweet texts in chronological order (oldest first)
+        Mapping of job name to that parser's return value
     """
-    if visited is None:
-        visited = set()
-    
-    if tweet_id in visited or max_depth <= 0:
-        return []
-    
-    visited.add(tweet_id)
-    context = []
-    
-    # Get the current tweet content
-    current_content = tweet_lookup.get(tweet_id, "")
-    if current_content:
-        context.append(current_content)
-    
-    # Note: For deeper thread context, we'd need parent relationships
-    # The current implementation is already limited to 1 level, which is good
+    if len(jobs) <= 1:
+        return {name: func(*func_args) for name, (func, func_args) in jobs.items()}
     
-    return context
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+        futures = {name: pool.submit(func, *func_args) for name, (func, func_args) in jobs.items()}
+        return {name: future.result() for name, future in futures.items()}
+
 
 
 def build_context_chain(tweet_id: str, meta_by_id: Dict[str, Dict[str, Any]], text_lookup: Dict[str, str], 
@@ -563,18 +678,26 @@ def export_unified_text(records: List[Dict[str, Any]],
                         url_mappings: Dict[str, str] = None) -> None:
     """Unified export function with recursive context for all record types."""
     
+    # The mappings are fixed for the whole export, so compile their patterns once
+    # instead of once per tweet and context tweet
+    expand_urls = mapping_replacer(url_mappings) if url_mappings else None
+    add_url_meta = mapping_replacer(url_to_meta) if url_to_meta else None
+    
     def process_text(text: str) -> str:
         """Apply HTML unescaping, URL expansion, image captions, and metadata to text."""
         # First, convert any HTML entities (e.g., &gt;, &amp;) back to their symbols
         text = html.unescape(text)
 
-        # Then apply the usual transformations
-        if url_mappings:
-            text = expand_short_urls(text, url_mappings)
-        if url_to_caption:
-            text = replace_images_with_captions(text, url_to_caption)
-        if url_to_meta:
-            text = replace_urls_with_meta(text, url_to_meta)
+        # Then apply the usual transformations. Every mapping key and image URL contains
+        # "http", so a text without it (most replies) skips the matchers; the pbs.twimg.com
+        # test likewise skips the caption regex for texts with no image links.
+        if "http" in text:
+            if expand_urls:
+                text = expand_urls(text)
+            if url_to_caption and "pbs.twimg.com" in text:
+                text = replace_images_with_captions(text, url_to_caption)
+            if add_url_meta:
+                text = add_url_meta(text)
         return text.replace("\r", "")
     
     def strip_trailing_quote_url(text: str, quoted_id: str, url_mappings: Dict[str, str]) -> str:
@@ -602,7 +725,8 @@ def export_unified_text(records: List[Dict[str, Any]],
     # Track tweets that have already been displayed in context chains to prevent duplication
     already_displayed = set()
     
-    with outfile.open("w", encoding="utf-8") as f:
+    # Each tweet is written as many small fragments; a large buffer coalesces them
+    with outfile.open("w", encoding="utf-8", buffering=READ_BUFFER_SIZE) as f:
         # Determine the tag name from the filename
         file_type = outfile.stem.split('_')[0]  # Extract 'tweets', 'likes', or 'bookmarks' from filename
         f.write(f"<{file_type}>\n")
@@ -610,7 +734,7 @@ def export_unified_text(records: List[Dict[str, Any]],
         # Track if we've written any content for separator logic
         content_written = False
         
-        for i, record in enumerate(records):
+        for record in records:
             tweet_id = record.get("id")
             source = record.get("source", "")
             
@@ -820,6 +944,20 @@ def export_unified_text(records: List[Dict[str, Any]],
 #  URL Metadata Extraction                                                    #
 # --------------------------------------------------------------------------- #
 
+@functools.lru_cache(maxsize=4096)
+def _is_private_host(hostname: str) -> bool:
+    """Resolve hostname and report whether it points at a private, loopback or link-local address.
+    
+    Cached so each host is resolved once per run, however many of its URLs are checked.
+    """
+    try:
+        ip_obj = ipaddress.ip_address(socket.gethostbyname(hostname))
+        return ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_link_local
+    except (socket.gaierror, ValueError):
+        # If we can't resolve, let it through (will fail on request)
+        return False
+
+
 def should_fetch_url(url: str, allow_domains: set = None) -> bool:
     """Check if a URL is safe to fetch (SSRF protection)."""
     try:
@@ -836,20 +974,89 @@ def should_fetch_url(url: str, allow_domains: set = None) -> bool:
             return False
         
         # Resolve hostname to IP and check for private ranges
-        try:
-            ip = socket.gethostbyname(hostname)
-            ip_obj = ipaddress.ip_address(ip)
-            if ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_link_local:
-                return False
-        except (socket.gaierror, ValueError):
-            # If we can't resolve, let it through (will fail on request)
-            pass
-            
-        return True
+        return not _is_private_host(hostname)
     except Exception:
         return False
 
 
+def url_retry_wait(attempt: int, response: requests.Response = None) -> float:
+    """Seconds to wait before retrying a URL or image fetch.
+    
+    Uses the server's Retry-After (seconds or HTTP-date) when present, otherwise
+    exponential backoff with jitter so concurrent workers don't retry in lockstep.
+    Either way the wait is capped at URL_RETRY_BACKOFF_MAX.
+    """
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), URL_RETRY_BACKOFF_MAX)
+        except ValueError:
+            try:
+                retry_at = email.utils.parsedate_to_datetime(retry_after)
+                return min(max(retry_at.timestamp() - time.time(), 0.0), URL_RETRY_BACKOFF_MAX)
+            except (TypeError, ValueError):
+                pass
+    return min(URL_RETRY_BACKOFF_MAX, 2 ** attempt) + random.uniform(0, 1)
+
+
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+_host_slots_lock = threading.Lock()
+
+def host_fetch_slot(url: str) -> threading.BoundedSemaphore:
+    """Semaphore limiting concurrent metadata fetches to one host to URL_PER_HOST_FETCHES."""
+    host = urllib.parse.urlparse(url).hostname or ""
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(URL_PER_HOST_FETCHES)
+        return slot
+
+
+_HEAD_END_RE = re.compile(rb"</head\s*>", re.IGNORECASE)
+
+def read_html_head(response: requests.Response) -> bytes:
+    """Read a streamed HTML response only up to the end of its <head>.
+    
+    The title and meta description live in <head>, so the rest of the page is never
+    downloaded. Reading stops at </head> or after URL_HEAD_MAX_BYTES, whichever comes first.
+    """
+    body = bytearray()
+    try:
+        for chunk in response.iter_content(chunk_size=16 * 1024):
+            # Rescan a few bytes of the previous chunk in case the tag straddles the boundary
+            search_from = max(len(body) - 8, 0)
+            body += chunk
+            if _HEAD_END_RE.search(body, search_from) or len(body) >= URL_HEAD_MAX_BYTES:
+                break
+    finally:
+        response.close()
+    return bytes(body)
+
+
+def extract_title_description(head: bytes) -> tuple[str, str]:
+    """Pull the <title> text and meta (or og:) description out of a page's <head>.
+    
+    Uses selectolax when it is installed and BeautifulSoup otherwise; both handle
+    attribute order, quoting and entities the same way, which a regex would not.
+    """
+    if LexborHTMLParser is not None:
+        tree = LexborHTMLParser(head)
+        title_tag = tree.css_first('title')
+        desc_tag = (tree.css_first('meta[name="description"]')
+                    or tree.css_first('meta[property="og:description"]'))
+        title = title_tag.text() if title_tag else ""
+        description = (desc_tag.attributes.get('content') or "") if desc_tag else ""
+        return title.strip(), description.strip()
+    
+    soup = BeautifulSoup(head, HTML_PARSER)
+    title_tag = soup.find('title')
+    desc_tag = (soup.find('meta', attrs={'name': 'description'})
+                or soup.find('meta', attrs={'property': 'og:description'}))
+    title = title_tag.get_text() if title_tag else ""
+    description = desc_tag.get('content', '') if desc_tag else ""
+    return title.strip(), description.strip()
+
+
 def fetch_url_metadata(url: str, max_retries: int = 1, allow_domains: set = None) -> Dict[str, str]:
     """Fetch meta title and description from a URL with retry logic.
     
@@ -868,66 +1075,54 @@ def fetch_url_metadata(url: str, max_retries: int = 1, allow_domains: set = None
             'description': ""
         }
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
-    for attempt in range(max_retries + 1):
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
+    # Hold one of the host's slots for the whole fetch, including any backoff, so a
+    # rate-limiting site isn't hit by the other workers while we wait on it
+    with host_fetch_slot(url):
+        for attempt in range(max_retries + 1):
+            try:
+                response = HTTP_SESSION.get(url, timeout=URL_FETCH_TIMEOUT, stream=True)
+            
+                # Handle rate limiting with exponential backoff
+                if response.status_code == 429:
+                    response.close()
+                    if attempt < max_retries:
+                        wait_time = url_retry_wait(attempt, response)
+                        print(f"⏳ Rate limited on {url}, waiting {wait_time:.1f}s (attempt {attempt + 1}/{max_retries + 1})")
+                        time.sleep(wait_time)
+                        continue
+                    else:
+                        return {
+                            'title': f"ERROR: Rate limited after {max_retries} retries",
+                            'description': ""
+                        }
+            
+                if not response.ok:
+                    response.close()
+                response.raise_for_status()
+            
+                title, description = extract_title_description(read_html_head(response))
+            
+                return {
+                    'title': title,
+                    'description': description
+                }
             
-            # Handle rate limiting with exponential backoff
-            if response.status_code == 429:
+            except requests.exceptions.RequestException as e:
                 if attempt < max_retries:
-                    wait_time = (2 ** attempt) * 1  # 1, 2, 4 seconds
-                    print(f"⏳ Rate limited on {url}, waiting {wait_time}s (attempt {attempt + 1}/{max_retries + 1})")
+                    wait_time = url_retry_wait(attempt)
+                    print(f"⚠️  Request failed for {url}, retrying in {wait_time:.1f}s (attempt {attempt + 1}/{max_retries + 1}): {e}")
                     time.sleep(wait_time)
                     continue
                 else:
                     return {
-                        'title': f"ERROR: Rate limited after {max_retries} retries",
+                        'title': f"ERROR: {e}",
                         'description': ""
                     }
-            
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract title
-            title = ""
-            title_tag = soup.find('title')
-            if title_tag:
-                title = title_tag.get_text().strip()
-            
-            # Extract meta description
-            description = ""
-            desc_tag = soup.find('meta', attrs={'name': 'description'})
-            if not desc_tag:
-                desc_tag = soup.find('meta', attrs={'property': 'og:description'})
-            if desc_tag:
-                description = desc_tag.get('content', '').strip()
-            
-            return {
-                'title': title,
-                'description': description
-            }
-            
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries:
-                wait_time = (2 ** attempt) * 1  # 1, 2, 4 seconds
-                print(f"⚠️  Request failed for {url}, retrying in {wait_time}s (attempt {attempt + 1}/{max_retries + 1}): {e}")
-                time.sleep(wait_time)
-                continue
-            else:
+            except Exception as e:
                 return {
                     'title': f"ERROR: {e}",
                     'description': ""
                 }
-        except Exception as e:
-            return {
-                'title': f"ERROR: {e}",
-                'description': ""
-            }
     
     # Should not reach here, but just in case
     return {
@@ -936,7 +1131,48 @@ def fetch_url_metadata(url: str, max_retries: int = 1, allow_domains: set = None
     }
 
 
-def generate_url_metadata_from_texts(texts: List[str], max_urls: int = 1000, allow_domains: set = None) -> Dict[str, str]:
+def fetch_url_metadata_concurrently(urls: List[str], allow_domains: set = None) -> Dict[str, Dict[str, str]]:
+    """Fetch metadata for many URLs with a thread pool and build their enhanced format.
+    
+    Args:
+        urls: Unique URLs to fetch
+        allow_domains: Set of allowed domains for fetching (optional)
+    
+    Returns:
+        Dictionary mapping URLs to {'title', 'description', 'enhanced'}, in the order of urls
+    """
+    url_to_meta = {}
+    if not urls:
+        return url_to_meta
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(URL_FETCH_WORKERS, len(urls))) as pool:
+        futures = {pool.submit(fetch_url_metadata, url, allow_domains=allow_domains): url for url in urls}
+        for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            url = futures[future]
+            try:
+                metadata = future.result()
+                title = metadata['title']
+                description = metadata['description']
+                
+                # Create the enhanced format: URL (title - description)
+                if title and description:
+                    enhanced = f"{url} ({title} - {description})"
+                elif title:
+                    enhanced = f"{url} ({title})"
+                else:
+                    enhanced = url  # Keep original if no metadata found
+                
+                url_to_meta[url] = {'title': title, 'description': description, 'enhanced': enhanced}
+                print(f"✅  [{i}/{len(urls)}] Generated metadata for {url}")
+            except Exception as e:
+                url_to_meta[url] = {'title': "", 'description': "", 'enhanced': url}  # Keep original on error
+                print(f"❌  [{i}/{len(urls)}] Failed to get metadata for {url}: {e}")
+    
+    # Completion order is arbitrary; keep the input order so saved CSVs stay stable
+    return {url: url_to_meta[url] for url in urls}
+
+
+def generate_url_metadata_from_texts(texts: List[str], max_urls: int = 1000, allow_domains: set = None) -> Dict[str, Dict[str, str]]:
     """Generate metadata for all external URLs found in the given texts.
     
     Args:
@@ -945,23 +1181,16 @@ def generate_url_metadata_from_texts(texts: List[str], max_urls: int = 1000, all
         allow_domains: Set of allowed domains for fetching (optional)
     
     Returns:
-        Dictionary mapping URLs to their enhanced format with title and description
+        Dictionary mapping URLs to {'title', 'description', 'enhanced'}, where enhanced is
+        the URL followed by its title and description
     """
     url_to_meta = {}
     all_urls = set()
     
     # Collect all unique external URLs from all texts
     for text in texts:
-        urls = URL_RE.findall(text)
         # Filter out URLs with excluded file extensions
-        filtered_urls = []
-        for url in urls:
-            # Check if URL ends with any excluded extension
-            url_lower = url.lower()
-            is_excluded = any(url_lower.endswith(ext) for ext in EXCLUDE_EXTENSIONS)
-            if not is_excluded:
-                filtered_urls.append(url)
-        all_urls.update(filtered_urls)
+        all_urls.update(url for url in URL_RE.findall(text) if not url.lower().endswith(EXCLUDE_EXTENSIONS))
     
     # Limit the number of URLs to process
     urls_to_process = list(all_urls)[:max_urls]
@@ -969,43 +1198,20 @@ def generate_url_metadata_from_texts(texts: List[str], max_urls: int = 1000, all
         print(f"⚠️  Found {len(all_urls)} URLs, limiting to first {max_urls} for processing")
     
     # Generate metadata for each unique URL
-    for i, url in enumerate(urls_to_process, 1):
-        try:
-            metadata = fetch_url_metadata(url, allow_domains=allow_domains)
-            title = metadata['title']
-            description = metadata['description']
-            
-            # Create the enhanced format: URL (title - description)
-            if title and description:
-                enhanced = f"{url} ({title} - {description})"
-            elif title:
-                enhanced = f"{url} ({title})"
-            else:
-                enhanced = url  # Keep original if no metadata found
-            
-            url_to_meta[url] = enhanced
-            print(f"✅  [{i}/{len(urls_to_process)}] Generated metadata for {url}")
-        except Exception as e:
-            url_to_meta[url] = url  # Keep original on error
-            print(f"❌  [{i}/{len(urls_to_process)}] Failed to get metadata for {url}: {e}")
+    url_to_meta.update(fetch_url_metadata_concurrently(urls_to_process, allow_domains))
     
     return url_to_meta
 
 
-def generate_url_metadata_from_urls(urls_to_process: List[str], max_urls: int = 1000, allow_domains: set = None) -> Dict[str, str]:
-    """Generate metadata for a list of URLs."""
+def generate_url_metadata_from_urls(urls_to_process: List[str], max_urls: int = 1000, allow_domains: set = None) -> Dict[str, Dict[str, str]]:
+    """Generate {'title', 'description', 'enhanced'} metadata for a list of URLs."""
     url_to_meta = {}
     
     if not urls_to_process:
         return url_to_meta
     
     # Filter out URLs with excluded file extensions
-    filtered_urls = []
-    for url in urls_to_process:
-        url_lower = url.lower()
-        is_excluded = any(url_lower.endswith(ext) for ext in EXCLUDE_EXTENSIONS)
-        if not is_excluded:
-            filtered_urls.append(url)
+    filtered_urls = [url for url in urls_to_process if not url.lower().endswith(EXCLUDE_EXTENSIONS)]
     
     # Limit the number of URLs to process
     if len(filtered_urls) > max_urls:
@@ -1013,103 +1219,95 @@ def generate_url_metadata_from_urls(urls_to_process: List[str], max_urls: int =
         print(f"⚠️  Found {len(urls_to_process)} URLs, limiting to first {max_urls} for processing")
     
     # Generate metadata for each unique URL
-    for i, url in enumerate(filtered_urls, 1):
-        try:
-            metadata = fetch_url_metadata(url, allow_domains=allow_domains)
-            title = metadata['title']
-            description = metadata['description']
-            
-            # Create the enhanced format: URL (title - description)
-            if title and description:
-                enhanced = f"{url} ({title} - {description})"
-            elif title:
-                enhanced = f"{url} ({title})"
-            else:
-                enhanced = url  # Keep original if no metadata found
-            
-            url_to_meta[url] = enhanced
-            print(f"✅  [{i}/{len(filtered_urls)}] Generated metadata for {url}")
-        except Exception as e:
-            url_to_meta[url] = url  # Keep original on error
-            print(f"❌  [{i}/{len(filtered_urls)}] Failed to get metadata for {url}: {e}")
+    url_to_meta.update(fetch_url_metadata_concurrently(filtered_urls, allow_domains))
     
     return url_to_meta
 
 
-def expand_short_urls(text: str, url_mappings: Dict[str, str]) -> str:
-    """Expand shortened URLs in text using the URL mappings with optimized regex replacement."""
-    import re
-    if not url_mappings:
-        return text
-    
-    # Sort by length (longest first) to avoid partial replacements
-    # Escape special regex characters and create pattern
-    pattern = re.compile('|'.join(re.escape(k) for k in sorted(url_mappings, key=len, reverse=True)))
+def mapping_replacer(mapping: Dict[str, str]) -> Callable[[str], str]:
+    """Build a function that replaces every key of mapping found in a text with its value.
     
-    # Single-pass replacement using regex substitution
-    return pattern.sub(lambda m: url_mappings[m.group(0)], text)
-
-
-def replace_urls_with_meta(text: str, url_to_meta: Dict[str, str]) -> str:
-    """Replace URLs in text with enhanced format including title and description with optimized regex replacement."""
-    import re
-    if not url_to_meta:
-        return text
+    The matcher is built once here, so callers that apply the same mapping to every
+    tweet don't rebuild it per call. With pyahocorasick installed it is an Aho-Corasick
+    automaton; otherwise a regex alternation.
+    """
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for key, value in mapping.items():
+            automaton.add_word(key, (len(key), value))
+        automaton.make_automaton()
+        
+        def replace(text: str) -> str:
+            # iter_long yields non-overlapping longest matches, like the longest-first regex
+            parts = []
+            last = 0
+            for end, (length, value) in automaton.iter_long(text):
+                parts.append(text[last:end - length + 1])
+                parts.append(value)
+                last = end + 1
+            if not parts:
+                return text
+            parts.append(text[last:])
+            return "".join(parts)
+        return replace
     
     # Sort by length (longest first) to avoid partial replacements
     # Escape special regex characters and create pattern
-    pattern = re.compile('|'.join(re.escape(k) for k in sorted(url_to_meta, key=len, reverse=True)))
+    pattern = re.compile('|'.join(re.escape(k) for k in sorted(mapping, key=len, reverse=True)))
     
     # Single-pass replacement using regex substitution
-    return pattern.sub(lambda m: url_to_meta[m.group(0)], text)
+    return lambda text: pattern.sub(lambda m: mapping[m.group(0)], text)
 
 
-def save_url_metadata_csv(url_to_meta: Dict[str, str], out_path: Path):
-    """Save URL to metadata mappings as CSV, merging with existing data."""
-    # Read existing URL metadata if file exists
+def load_url_metadata_csv(csv_path: Path) -> Dict[str, Dict[str, str]]:
+    """Load URL to {'title', 'description', 'enhanced'} metadata saved by an earlier run, if any."""
     existing_metadata = {}
-    if out_path.exists():
+    if csv_path.exists():
         try:
-            with out_path.open("r", newline="", encoding="utf-8") as f:
+            with csv_path.open("r", newline="", encoding="utf-8") as f:
                 reader = csv.DictReader(f)
                 for row in reader:
-                    existing_metadata[row["url"]] = row["enhanced"]
-            print(f"📖  Loaded {len(existing_metadata)} existing URL metadata from {out_path.name}")
+                    existing_metadata[row["url"]] = {
+                        'title': row.get("title") or "",
+                        'description': row.get("description") or "",
+                        'enhanced': row["enhanced"],
+                    }
+            print(f"📖  Loaded {len(existing_metadata)} existing URL metadata from {csv_path.name}")
         except Exception as e:
             print(f"⚠️  Failed to read existing URL metadata: {e}")
+    return existing_metadata
+
+
+def is_cacheable_url_meta(meta: Dict[str, str]) -> bool:
+    """Whether fetched metadata is worth keeping: it has a title and the fetch didn't fail."""
+    title = meta.get('title') or ""
+    return bool(title) and not title.startswith("ERROR")
+
+
+def save_url_metadata_csv(url_to_meta: Dict[str, Dict[str, str]], out_path: Path,
+                          existing_metadata: Dict[str, Dict[str, str]] = None):
+    """Save URL to {'title', 'description', 'enhanced'} metadata as CSV, merging with existing data."""
+    # Read existing URL metadata if file exists
+    if existing_metadata is None:
+        existing_metadata = load_url_metadata_csv(out_path)
     
-    # Merge new metadata with existing (new ones take priority)
-    all_metadata = existing_metadata.copy()
-    all_metadata.update(url_to_meta)
-    
-    # Convert to rows format
-    metadata_rows = []
-    for original_url, enhanced in all_metadata.items():
-        # Extract title and description from enhanced format
-        if " (" in enhanced and enhanced.endswith(")"):
-            meta_part = enhanced[enhanced.rfind(" (") + 2:-1]
-            if " - " in meta_part:
-                title, description = meta_part.split(" - ", 1)
-            else:
-                title = meta_part
-                description = ""
-        else:
-            title = ""
-            description = ""
-        
-        metadata_rows.append({
-            "url": original_url,
-            "title": title,
-            "description": description,
-            "enhanced": enhanced
-        })
+    # Merge new metadata with existing (new ones take priority). Failed fetches are
+    # left out so a network outage isn't saved into the cache and reused next run.
+    new_metadata = {url: meta for url, meta in url_to_meta.items()
+                    if not (meta.get('title') or "").startswith("ERROR")}
+    all_metadata = {url: meta for url, meta in existing_metadata.items()
+                    if not (meta.get('title') or "").startswith("ERROR")}
+    all_metadata.update(new_metadata)
+    
+    # Convert to rows format; title and description are carried through, not re-parsed from enhanced
+    metadata_rows = [{"url": original_url, **meta} for original_url, meta in all_metadata.items()]
     
     with out_path.open("w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, ["url", "title", "description", "enhanced"])
         writer.writeheader()
         writer.writerows(metadata_rows)
     
-    new_count = len(url_to_meta)
+    new_count = len(new_metadata)
     total_count = len(all_metadata)
     print(f"✅  Saved {total_count} total URL metadata ({new_count} new, {total_count - new_count} existing)")
 
@@ -1130,7 +1328,8 @@ AVOID describing:
 - Colors, fonts, or specific layout details (e.g., "two-column layout", "serif font").
 - Minor background elements or artistic style unless it's the main subject.
 - Do not begin with "This image shows..." or "The picture depicts...".
-"""):
+""", url_hashes: Dict[str, str] = None):
+    """Caption one image, caching by the sha1 of its bytes; if url_hashes is given, url -> sha1 is recorded there."""
     # Resolve t.co URLs to actual image URLs
     actual_image_url = url
     if media_mappings and url in media_mappings:
@@ -1139,14 +1338,31 @@ AVOID describing:
         # If it's a t.co URL but we don't have mappings, we can't process it
         return f"ERROR: Cannot resolve t.co URL {url} without media mappings"
     
-    # Download image with proper validation
+    # Download image with proper validation, retrying rate limits, 5xx and network errors.
+    # Streamed so the body is only read once the headers show it is an image.
     try:
-        response = requests.get(actual_image_url, timeout=15)
-        response.raise_for_status()  # Raise exception for 4xx/5xx status codes
+        for attempt in range(IMAGE_RETRIES + 1):
+            try:
+                response = HTTP_SESSION.get(actual_image_url, timeout=15, stream=True)
+                if response.status_code in RETRYABLE_STATUSES and attempt < IMAGE_RETRIES:
+                    response.close()
+                    time.sleep(url_retry_wait(attempt, response))
+                    continue
+                if not response.ok:
+                    response.close()
+                response.raise_for_status()  # Raise exception for 4xx/5xx status codes
+                break
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                # Only transient failures are retried; HTTP errors like 404 fail straight away
+                if attempt < IMAGE_RETRIES:
+                    time.sleep(url_retry_wait(attempt))
+                    continue
+                raise
         
         # Verify it's actually an image
         content_type = response.headers.get('Content-Type', '').lower()
         if not content_type.startswith('image/'):
+            response.close()
             return f"ERROR: URL returned {content_type}, not an image"
         
         img_bytes = response.content
@@ -1160,38 +1376,145 @@ AVOID describing:
     
     # Check cache first if cache_dir provided
     if cache_dir:
-        cache_file = cache_dir / f"{img_hash}.txt"
-        if cache_file.exists():
-            try:
-                return cache_file.read_text(encoding="utf-8")
-            except Exception as e:
-                print(f"⚠️  Failed to read cached caption for {img_hash}: {e}", file=sys.stderr)
-                # Fall through to generate new caption
-    
-    # Generate new caption
-    mime = mimetypes.guess_type(actual_image_url)[0] or "image/jpeg"
+        caption = read_cached_caption(cache_dir / f"{img_hash}.txt")
+        if caption is not None:
+            if url_hashes is not None:
+                url_hashes[url] = img_hash
+            return caption
+    
+    # Generate new caption; the server's Content-Type was already validated above and,
+    # unlike guessing from the URL, also works for pbs "?format=jpg" style links
+    mime = content_type.split(';', 1)[0].strip() or mimetypes.guess_type(actual_image_url)[0] or "image/jpeg"
     client = get_client()
-    resp = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[
-            types.Part.from_bytes(data=img_bytes, mime_type=mime),
-            prompt
-        ],
-    )
+    for attempt in range(IMAGE_RETRIES + 1):
+        try:
+            resp = client.models.generate_content(
+                model="gemini-2.5-flash",
+                contents=[
+                    types.Part.from_bytes(data=img_bytes, mime_type=mime),
+                    prompt
+                ],
+            )
+            break
+        except Exception as e:
+            # Gemini API errors carry the HTTP status as .code; rate limits and outages are retried
+            if getattr(e, 'code', None) in RETRYABLE_STATUSES and attempt < IMAGE_RETRIES:
+                time.sleep(url_retry_wait(attempt))
+                continue
+            raise
     caption = resp.text
     
-    # Save to cache if cache_dir provided
-    if cache_dir:
+    # Save to cache if cache_dir provided; an empty caption is not worth keeping
+    if cache_dir and caption:
+        cache_file = cache_dir / f"{img_hash}.txt"
+        # Write to a per-thread temp file and rename it into place, so a reader (or another
+        # worker captioning the same image) never sees a half-written caption
+        tmp_file = cache_file.with_name(f"{img_hash}.{os.getpid()}-{threading.get_ident()}.tmp")
         try:
-            cache_dir.mkdir(exist_ok=True)
-            cache_file = cache_dir / f"{img_hash}.txt"
-            cache_file.write_text(caption, encoding="utf-8")
+            tmp_file.write_text(caption, encoding="utf-8")
+            os.replace(tmp_file, cache_file)
+            if url_hashes is not None:
+                url_hashes[url] = img_hash
         except Exception as e:
             print(f"⚠️  Failed to cache caption for {img_hash}: {e}")
     
     return caption
 
 
+def read_cached_caption(cache_file: Path) -> str | None:
+    """Return a cached caption, or None if it is missing, unreadable, empty or an error string."""
+    try:
+        caption = cache_file.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        print(f"⚠️  Failed to read cached caption {cache_file.name}: {e}", file=sys.stderr)
+        return None
+    if not caption.strip() or caption.startswith("ERROR:"):
+        return None  # Corrupt entry; caption the image again and overwrite it
+    return caption
+
+
+def load_image_hash_index(cache_dir: Path) -> Dict[str, str]:
+    """Load the image URL -> sha1 index kept next to the cached captions (empty if missing or unreadable)."""
+    index_path = cache_dir / IMAGE_HASH_INDEX_NAME
+    if not index_path.exists():
+        return {}
+    try:
+        return json_loads(index_path.read_bytes())
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Could not read {index_path.name}, ignoring it: {e}")
+        return {}
+
+
+def save_image_hash_index(cache_dir: Path, url_hashes: Dict[str, str]):
+    """Write the image URL -> sha1 index atomically so an interrupted run can't truncate it."""
+    index_path = cache_dir / IMAGE_HASH_INDEX_NAME
+    try:
+        tmp_path = index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(url_hashes, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        print(f"⚠️  Failed to save {index_path.name}: {e}")
+
+
+def caption_images_concurrently(urls: List[str], media_mappings: Dict[str, str] = None,
+                                cache_dir: Path = None) -> Dict[str, str]:
+    """Caption many images with a thread pool; each worker downloads, checks the cache, then calls Gemini.
+    
+    Args:
+        urls: Unique image URLs to caption
+        media_mappings: Dictionary mapping t.co URLs to actual image URLs
+        cache_dir: Optional directory for caching captions by image hash
+    
+    Returns:
+        Dictionary mapping image URLs to their captions (or "ERROR: ..." strings), in the order of urls
+    """
+    url_to_caption = {}
+    if not urls:
+        return url_to_caption
+    
+    if cache_dir:
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)  # Once here rather than in every worker
+        except OSError as e:
+            print(f"⚠️  Cannot create image cache {cache_dir}, captioning without it: {e}")
+            cache_dir = None
+    
+    # Images captioned on an earlier run are answered from the url -> hash index without downloading
+    url_hashes = load_image_hash_index(cache_dir) if cache_dir else {}
+    known_hashes = len(url_hashes)
+    pending = []
+    for url in urls:
+        img_hash = url_hashes.get(url)
+        caption = read_cached_caption(cache_dir / f"{img_hash}.txt") if img_hash else None
+        if caption is not None:
+            url_to_caption[url] = caption
+            continue
+        pending.append(url)  # Not indexed, or its cache entry is missing or corrupt
+    if len(pending) < len(urls):
+        print(f"💾  {len(urls) - len(pending)} images answered from cache without downloading")
+    
+    if pending:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(IMAGE_CAPTION_WORKERS, len(pending))) as pool:
+            futures = {pool.submit(describe_image, url, media_mappings, cache_dir, url_hashes=url_hashes): url
+                       for url in pending}
+            for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                url = futures[future]
+                try:
+                    url_to_caption[url] = future.result()
+                    print(f"✅  [{i}/{len(pending)}] Generated caption: {url[:50]}...")
+                except Exception as e:
+                    url_to_caption[url] = f"ERROR: {e}"
+                    print(f"❌  [{i}/{len(pending)}] Failed to caption {url[:50]}...: {e}")
+    
+    if cache_dir and len(url_hashes) != known_hashes:
+        save_image_hash_index(cache_dir, url_hashes)
+    
+    # Completion order is arbitrary; keep the input order so saved CSVs stay stable
+    return {url: url_to_caption[url] for url in urls}
+
+
 def generate_image_captions_from_texts(texts: List[str], media_mappings: Dict[str, str] = None, cache_dir: Path = None, max_images: int = 500) -> Dict[str, str]:
     """Generate captions for all images found in the given texts.
     
@@ -1230,22 +1553,15 @@ def generate_image_captions_from_texts(texts: List[str], media_mappings: Dict[st
     if media_mappings:
         print(f"🔗  Using media mappings for {len(media_mappings)} t.co URLs")
     
-    # Generate captions for each unique URL
-    for i, url in enumerate(urls_to_process, 1):
-        # Skip t.co URLs that we don't have mappings for
+    # Skip t.co URLs that we don't have mappings for
+    captionable_urls = []
+    for url in urls_to_process:
         if url.startswith("https://t.co/") and (not media_mappings or url not in media_mappings):
-            print(f"⏭️  [{i}/{len(urls_to_process)}] Skipping unknown t.co URL: {url}")
-            continue
-            
-        try:
-            caption = describe_image(url, media_mappings, cache_dir)
-            url_to_caption[url] = caption
-            print(f"✅  [{i}/{len(urls_to_process)}] Generated caption: {url[:50]}...")
-        except Exception as e:
-            caption = f"ERROR: {e}"
-            url_to_caption[url] = caption
-            print(f"❌  [{i}/{len(urls_to_process)}] Failed to caption {url[:50]}...: {e}")
+            print(f"⏭️  Skipping unknown t.co URL: {url}")
+        else:
+            captionable_urls.append(url)
     
+    url_to_caption.update(caption_images_concurrently(captionable_urls, media_mappings, cache_dir))
     return url_to_caption
 
 
@@ -1264,18 +1580,8 @@ def generate_image_captions_from_urls(urls_to_process: List[str], cache_dir: Pat
     if cache_dir:
         print(f"💾  Using image caption cache: {cache_dir}")
     
-    # Generate captions for each unique URL
-    for i, url in enumerate(urls_to_process, 1):
-        try:
-            # For cleaned data, URLs are already expanded, no need for media_mappings
-            caption = describe_image(url, None, cache_dir)
-            url_to_caption[url] = caption
-            print(f"✅  [{i}/{len(urls_to_process)}] Generated caption: {url[:50]}...")
-        except Exception as e:
-            caption = f"ERROR: {e}"
-            url_to_caption[url] = caption
-            print(f"❌  [{i}/{len(urls_to_process)}] Failed to caption {url[:50]}...: {e}")
-    
+    # For cleaned data, URLs are already expanded, no need for media_mappings
+    url_to_caption.update(caption_images_concurrently(urls_to_process, None, cache_dir))
     return url_to_caption
 
 
@@ -1356,6 +1662,7 @@ def gen_captions(bookmarks_path: pathlib.Path, out_path: pathlib.Path):
 def safe_messagebox(message_type: str, title: str, message: str) -> None:
     """Show message via GUI or print to console in headless environments."""
     try:
+        from tkinter import messagebox
         if message_type == "error":
             messagebox.showerror(title, message)
         elif message_type == "info":
@@ -1390,8 +1697,20 @@ def get_folder_path() -> tuple[Path, argparse.Namespace]:
         print(f"📁  Using folder from CLI: {folder}")
         return folder, args
     
+    # tkinter is only imported when the picker is actually needed, so --folder runs
+    # don't load Tk at all
+    try:
+        import tkinter as tk
+        from tkinter import filedialog
+        tcl_error = tk.TclError
+    except ImportError:
+        tk = None
+        tcl_error = ()  # Matches nothing; a missing tkinter takes the generic path below
+    
     # Try GUI folder picker (may fail in headless environments)
     try:
+        if tk is None:
+            raise RuntimeError("tkinter is not installed")
         root = tk.Tk()
         root.withdraw()
         
@@ -1407,7 +1726,7 @@ def get_folder_path() -> tuple[Path, argparse.Namespace]:
         print(f"📁  Selected folder: {folder}")
         return folder, args
         
-    except tk.TclError as e:
+    except tcl_error as e:
         # Specific handling for display issues in headless environments
         print(f"⚠️  GUI not available (no display): {e}")
         print("💡  Use --folder argument to specify path, e.g.:")
@@ -1461,13 +1780,13 @@ def determine_self_ids(args: argparse.Namespace, tweets_file: Path = None, **kwa
     if tweets_file and tweets_file.exists():
         print(f"🔍  Detecting self ID from {tweets_file.name}...")
         try:
-            with tweets_file.open('r', encoding='utf-8') as infile:
+            with tweets_file.open('rb', buffering=READ_BUFFER_SIZE) as infile:
                 for line in infile:
                     if not line.strip():
                         continue
                     try:
                         # Read the author_id from the new clean format
-                        obj = json.loads(line)
+                        obj = json_loads(line)
                         uid = obj.get("author_id")
                         if uid:
                             self_ids.add(str(uid))
@@ -1561,7 +1880,7 @@ def main() -> None:
     if parents_file:
         found_files.append(f"✅  Found parents file: {parents_file.name}")
     else:
-        missing_files.append("ℹ️  No parents.json file found (optional - run hydrate_parents_api.py first to enable reply context)")
+        missing_files.append("ℹ️  No parents.jsonl or parents.json file found (optional - run hydrate_parents_api.py first to enable reply context)")
     
     # Print status
     for msg in found_files:
@@ -1591,10 +1910,22 @@ def main() -> None:
         all_url_mappings = {}
         all_meta_by_id = {}  # Combined metadata for relationship tracking
         
+        # Parse every file up front in parallel; the merges below keep the priority order
+        parse_jobs = {
+            file_type: (parse_twitter_jsonl, (file_path, file_type, self_ids))
+            for file_type, file_path in (("tweets", tweets_file), ("likes", likes_file),
+                                         ("bookmarks", bookmarks_file), ("replies", replies_file))
+            if file_path
+        }
+        if parents_file:
+            parse_jobs["parents"] = (load_parents_json, (parents_file,))
+        print(f"\n🔄  Parsing {len(parse_jobs)} input files...")
+        parsed = parse_input_files(parse_jobs)
+        
         # Process all files with unified parser - tweets get highest priority
         if tweets_file:
-            print("\n🔄  Processing tweets...")
-            tweets_records, tweets_lookup, tweets_media, tweets_urls, tweets_meta = parse_twitter_jsonl(tweets_file, "tweets", self_ids)
+            print("🔄  Processing tweets...")
+            tweets_records, tweets_lookup, tweets_media, tweets_urls, tweets_meta = parsed["tweets"]
             all_records.extend(tweets_records)
             all_text_lookups.update(tweets_lookup)  # Tweets get first priority
             all_media_mappings.update(tweets_media)
@@ -1603,7 +1934,7 @@ def main() -> None:
         
         if likes_file:
             print("🔄  Processing likes...")
-            likes_records, likes_lookup, likes_media, likes_urls, likes_meta = parse_twitter_jsonl(likes_file, "likes", self_ids)
+            likes_records, likes_lookup, likes_media, likes_urls, likes_meta = parsed["likes"]
             all_records.extend(likes_records)
             # Add likes to lookup, but don't overwrite tweets
             for tweet_id, text in likes_lookup.items():
@@ -1618,7 +1949,7 @@ def main() -> None:
         
         if bookmarks_file:
             print("🔄  Processing bookmarks...")
-            bookmarks_records, bookmarks_lookup, bookmarks_media, bookmarks_urls, bookmarks_meta = parse_twitter_jsonl(bookmarks_file, "bookmarks", self_ids)
+            bookmarks_records, bookmarks_lookup, bookmarks_media, bookmarks_urls, bookmarks_meta = parsed["bookmarks"]
             all_records.extend(bookmarks_records)
             # Add bookmarks to lookup, but don't overwrite tweets or likes  
             for tweet_id, text in bookmarks_lookup.items():
@@ -1633,8 +1964,7 @@ def main() -> None:
         
         if replies_file:
             print("🔄  Processing replies...")
-            replies_records, replies_lookup, replies_media, replies_urls, replies_meta = \
-                parse_twitter_jsonl(replies_file, "replies", self_ids)
+            replies_records, replies_lookup, replies_media, replies_urls, replies_meta = parsed["replies"]
 
             all_records.extend(replies_records)
             for tweet_id, text in replies_lookup.items():
@@ -1654,7 +1984,7 @@ def main() -> None:
         # Load parent tweets if available
         if parents_file:
             print("🔄  Loading parent tweets...")
-            parent_lookup, parent_url_mappings, parent_metadata = load_parents_json(parents_file)
+            parent_lookup, parent_url_mappings, parent_metadata = parsed["parents"]
             all_url_mappings.update(parent_url_mappings)
             # Add parents to lookup, but don't overwrite existing tweets
             parents_added = 0
@@ -1670,7 +2000,7 @@ def main() -> None:
                     all_meta_by_id[tweet_id] = meta
                     parents_meta_added += 1
             
-            print(f"📖  Added {parents_added} parent tweets to lookup (total in parents.json: {len(parent_lookup)})")
+            print(f"📖  Added {parents_added} parent tweets to lookup (total in {parents_file.name}: {len(parent_lookup)})")
             if parents_meta_added > 0:
                 print(f"🔗  Added {parents_meta_added} parent metadata entries for deeper context chains")
         
@@ -1714,14 +2044,23 @@ def main() -> None:
             except Exception as e:
                 print(f"⚠️  Failed generating image captions: {e}")
 
-        # Generate URL metadata for all texts
+        # Generate URL metadata for all texts; url_to_meta is the URL -> enhanced text used in exports
         url_to_meta = {}
         try:
-            print(f"🔄  Generating URL metadata for {len(all_external_urls)} URLs...")
-            # This function also needs to be adapted to take a list of URLs
-            url_to_meta = generate_url_metadata_from_urls(list(all_external_urls), 3500)
-            if url_to_meta:
-                save_url_metadata_csv(url_to_meta, folder / "url_metadata.csv")
+            # url_metadata.csv doubles as a cache: URLs that got a real title on an earlier run
+            # are reused, and only new URLs (or ones that came back bare or failed) are fetched
+            url_metadata_path = folder / "url_metadata.csv"
+            cached_meta = load_url_metadata_csv(url_metadata_path)
+            url_metadata = {url: cached_meta[url] for url in all_external_urls
+                            if url in cached_meta and is_cacheable_url_meta(cached_meta[url])}
+            urls_to_fetch = [url for url in all_external_urls if url not in url_metadata]
+            if url_metadata:
+                print(f"💾  Reusing cached metadata for {len(url_metadata)} URLs")
+            print(f"🔄  Generating URL metadata for {len(urls_to_fetch)} URLs...")
+            url_metadata.update(generate_url_metadata_from_urls(urls_to_fetch, 3500))
+            url_to_meta = {url: meta['enhanced'] for url, meta in url_metadata.items()}
+            if url_metadata:
+                save_url_metadata_csv(url_metadata, url_metadata_path, cached_meta)
                 print("✅  Generated URL metadata and exported url_metadata.csv")
             else:
                 print("ℹ️  No external URLs found in the records")
@@ -1740,7 +2079,7 @@ def main() -> None:
         if combined_tweets_and_replies_records:
             print("🔄  Sorting combined tweets and replies chronologically...")
             combined_tweets_and_replies_records.sort(
-                key=lambda r: datetime.strptime(r['created_at'], '%a %b %d %H:%M:%S %z %Y'),
+                key=lambda r: parse_twitter_date(r['created_at']),
                 reverse=True
             )
         